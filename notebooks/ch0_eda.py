@@ -12,9 +12,9 @@ def _():
     import altair as alt
     import json
     import math
+    import orjson
     import sys
     import os
-    import requests
 
     sys.path.insert(0, os.path.dirname(__file__))
 
@@ -32,24 +32,37 @@ def _():
         pedshed_filter,
         s3_path,
         latlng_to_tile,
+        materialize_slice,
+        SLICE_SQL,
     )
+    from utils.pmtiles import read_metadata as read_pmtiles_metadata
+    from utils.pmtiles import range_source as pmtiles_range_source
+    from utils.stac import crawl_collections as crawl_stac_collections
+    from utils.stac import session as stac_session
 
     return (
         CITIES,
         METRIC_COLUMN_MAP,
         OVERTURE_THEMES,
         PMTILES_URLS,
+        SLICE_SQL,
+        STAC_CATALOG_URL,
         alt,
         bbox_from_center,
         bbox_predicate,
+        crawl_stac_collections,
         init_duckdb,
         json,
         latlng_to_tile,
+        materialize_slice,
         math,
         mo,
+        orjson,
         pl,
-        requests,
+        pmtiles_range_source,
+        read_pmtiles_metadata,
         s3_path,
+        stac_session,
     )
 
 
@@ -138,20 +151,47 @@ def bbox_setup(CITIES, bbox_from_center, city_dropdown, math, mo, radius_m):
 
 
 @app.cell
-def geoparquet_schema(
-    bbox, bbox_predicate, conn, mo, pl, s3_path, theme_dropdown, type_dropdown
+def current_slice(
+    bbox, conn, materialize_slice, s3_path, theme_dropdown, type_dropdown
+):
+    # One S3 scan per (theme, type, bbox); every query cell below reads
+    # from this temp table instead of re-reading the Parquet slice.  This
+    # stays in DuckDB rather than a Polars LazyFrame + collect_all: the
+    # geometry cells need ST_* functions Polars can't evaluate on WKB, so a
+    # Polars scan would add a second S3 read instead of sharing this one.
+    slice_table = materialize_slice(
+        conn, s3_path(theme_dropdown.value, type_dropdown.value), bbox
+    )
+    return (slice_table,)
+
+
+@app.cell
+def scan_plan(
+    SLICE_SQL, bbox, bbox_predicate, conn, mo, s3_path, theme_dropdown,
+    type_dropdown
 ):
+    # EXPLAIN only binds the query, so this reads Parquet footers, not data.
+    # The bbox bounds must show up under "Filters" on the READ_PARQUET node;
+    # if they appear in a separate FILTER node, row groups are not pruned.
     _s3 = s3_path(theme_dropdown.value, type_dropdown.value)
-    _bp = bbox_predicate(bbox)
-    _sql = f"""
+    _plan = conn.execute(
+        "EXPLAIN " + SLICE_SQL.format(predicate=bbox_predicate(bbox)),
+        {"path": _s3},
+    ).fetchone()[1]
+    mo.md(f"### Scan plan\n\n```\n{_plan}\n```")
+    return
+
+
+@app.cell
+def geoparquet_schema(conn, mo, s3_path, theme_dropdown, type_dropdown):
+    # DESCRIBE only binds the scan, so the schema comes from the Parquet
+    # footer and renders without waiting for the bbox slice.
+    _s3 = s3_path(theme_dropdown.value, type_dropdown.value)
+    _sql = """
         SELECT column_name, column_type, "null" AS nullable
-        FROM (DESCRIBE
-            SELECT * FROM read_parquet('{_s3}', hive_partitioning=1)
-            WHERE {_bp}
-            LIMIT 1
-        )
+        FROM (DESCRIBE SELECT * FROM read_parquet($path, hive_partitioning=1))
     """
-    schema_df = pl.from_pandas(conn.execute(_sql).fetchdf()).fill_nan(None)
+    schema_df = conn.execute(_sql, {"path": _s3}).pl()
     mo.md(
         f"""
         ## GeoParquet Schema
@@ -160,30 +200,56 @@ def geoparquet_schema(
 
         **S3 path:** `{_s3}`
 
-        {mo.ui.table(schema_df)}
+        {mo.ui.table(schema_df, selection=None, page_size=25)}
         """
     )
     return (schema_df,)
 
 
 @app.cell
-def geoparquet_sample(
-    bbox, bbox_predicate, conn, mo, pl, s3_path, theme_dropdown, type_dropdown
-):
-    _s3 = s3_path(theme_dropdown.value, type_dropdown.value)
-    _bp = bbox_predicate(bbox)
+def sample_columns_selector(mo, pl, schema_df):
+    # Nested STRUCT/LIST/MAP columns (names, sources, ...) dominate decode
+    # and render cost, so the default projection is the first 8 flat ones.
+    _options = schema_df.filter(pl.col("column_name") != "geometry")
+    _flat = _options.filter(
+        ~pl.col("column_type").str.contains(r"STRUCT|MAP|\[\]")
+    )["column_name"].to_list()
+    sample_columns = mo.ui.multiselect(
+        options=_options["column_name"].to_list(),
+        value=_flat[:8],
+        label="Sample columns",
+    )
+    return (sample_columns,)
+
+
+@app.cell
+def geoparquet_sample(conn, mo, pl, sample_columns, schema_df, slice_table):
+    mo.stop(
+        len(sample_columns.value) == 0,
+        mo.md(f"## Sample Data\n\n{sample_columns}\n\nSelect at least one column."),
+    )
+    # Nested columns are rendered as compact strings: the table frontend
+    # then ships flat values instead of re-encoding structs every render.
+    _nested = set(
+        schema_df.filter(pl.col("column_type").str.contains(r"STRUCT|MAP|\[\]"))["column_name"]
+    )
+    _projection = ", ".join(
+        f'CAST("{c}" AS VARCHAR) AS "{c}"' if c in _nested else f'"{c}"'
+        for c in sample_columns.value
+    )
     _sql = f"""
-        SELECT * EXCLUDE (geometry)
-        FROM read_parquet('{_s3}', hive_partitioning=1)
-        WHERE {_bp}
+        SELECT {_projection}
+        FROM {slice_table}
         LIMIT 50
     """
-    sample_df = pl.from_pandas(conn.execute(_sql).fetchdf()).fill_nan(None)
+    sample_df = conn.execute(_sql).pl().fill_nan(None)
     mo.md(
         f"""
-        ## Sample Data (50 rows, geometry excluded)
+        ## Sample Data (50 rows)
+
+        {sample_columns}
 
-        {mo.ui.table(sample_df)}
+        {mo.ui.table(sample_df, selection=None, page_size=25)}
         """
     )
     return (sample_df,)
@@ -191,66 +257,67 @@ def geoparquet_sample(
 
 @app.cell
 def column_profiler(mo, pl, sample_df):
-    _profiles = []
-    for _col in sample_df.columns:
-        _s = sample_df[_col]
-        _profile = {
-            "column": _col,
-            "dtype": str(_s.dtype),
-            "null_count": _s.null_count(),
-            "null_pct": round(_s.null_count() / max(len(_s), 1) * 100, 1),
-            "n_unique": _s.n_unique(),
-        }
-        if _s.dtype.is_numeric():
-            _non_null = _s.drop_nulls()
-            if len(_non_null) > 0:
-                _min_val = _non_null.min()
-                _max_val = _non_null.max()
-                _mean_val = _non_null.mean()
-                _profile["min"] = None if _min_val != _min_val else _min_val
-                _profile["max"] = None if _max_val != _max_val else _max_val
-                _profile["mean"] = None if _mean_val != _mean_val else round(float(_mean_val), 2)
-            else:
-                _profile["min"] = None
-                _profile["max"] = None
-                _profile["mean"] = None
-        else:
-            _profile["min"] = None
-            _profile["max"] = None
-            _profile["mean"] = None
-        _profiles.append(_profile)
-
-    import polars as _pl
+    import polars.selectors as _cs
+
+    # Every statistic for every column in one parallel select, then the
+    # single wide row is reshaped into a row per column.
+    _wide = sample_df.select(
+        pl.all().null_count().cast(pl.Float64).name.suffix("::null_count"),
+        pl.all().n_unique().cast(pl.Float64).name.suffix("::n_unique"),
+        _cs.numeric().min().cast(pl.Float64).name.suffix("::min"),
+        _cs.numeric().max().cast(pl.Float64).name.suffix("::max"),
+        _cs.numeric().mean().round(2).name.suffix("::mean"),
+    )
+    _stats = (
+        _wide.unpivot(variable_name="key")
+        .with_columns(
+            pl.col("key").str.split_exact("::", 1)
+            .struct.rename_fields(["column", "stat"])
+        )
+        .unnest("key")
+        .pivot(on="stat", index="column", values="value")
+    )
+    _stats = _stats.with_columns(
+        pl.lit(None, dtype=pl.Float64).alias(_c)
+        for _c in ("min", "max", "mean")
+        if _c not in _stats.columns
+    )
 
-    profile_df = _pl.DataFrame(_profiles).fill_nan(None)
+    profile_df = (
+        pl.DataFrame({
+            "column": sample_df.columns,
+            "dtype": [str(_t) for _t in sample_df.dtypes],
+        })
+        .join(_stats, on="column", how="left", maintain_order="left")
+        .select(
+            "column",
+            "dtype",
+            pl.col("null_count").cast(pl.UInt32),
+            (pl.col("null_count") / max(sample_df.height, 1) * 100)
+            .round(1).alias("null_pct"),
+            pl.col("n_unique").cast(pl.UInt32),
+            "min",
+            "max",
+            "mean",
+        )
+        .fill_nan(None)
+    )
     mo.md(
         f"""
         ## Column Profile
 
-        {mo.ui.table(profile_df)}
+        {mo.ui.table(profile_df, selection=None, page_size=25)}
         """
     )
     return
 
 
 @app.cell
-def value_distributions_selector(
-    bbox, bbox_predicate, conn, mo, s3_path, theme_dropdown, type_dropdown
-):
-    _s3 = s3_path(theme_dropdown.value, type_dropdown.value)
-    _bp = bbox_predicate(bbox)
-
-    _desc_sql = f"""
-        SELECT column_name, column_type
-        FROM (DESCRIBE
-            SELECT * FROM read_parquet('{_s3}', hive_partitioning=1)
-            WHERE {_bp} LIMIT 1
-        )
-        WHERE column_type IN ('VARCHAR', 'BOOLEAN')
-          AND column_name NOT IN ('id', 'geometry', 'names', 'sources', 'source_tags')
-    """
-    _cat_cols = conn.execute(_desc_sql).fetchall()
-    dist_col_names = [r[0] for r in _cat_cols]
+def value_distributions_selector(mo, pl, schema_df):
+    dist_col_names = schema_df.filter(
+        pl.col("column_type").is_in(["VARCHAR", "BOOLEAN"])
+        & ~pl.col("column_name").is_in(["id", "geometry", "names", "sources", "source_tags"])
+    )["column_name"].to_list()
 
     if len(dist_col_names) == 0:
         dist_col_dropdown = None
@@ -266,102 +333,174 @@ def value_distributions_selector(
 
 
 @app.cell
-def value_distributions_chart(
-    alt, bbox, bbox_predicate, conn, dist_col_dropdown, mo, pl,
-    s3_path, theme_dropdown, type_dropdown
-):
+def value_distributions_chart(alt, conn, dist_col_dropdown, mo, slice_table):
     mo.stop(dist_col_dropdown is None, mo.md(""))
 
-    _s3 = s3_path(theme_dropdown.value, type_dropdown.value)
-    _bp = bbox_predicate(bbox)
     _col = dist_col_dropdown.value
-
-    _val_sql = f"""
-        SELECT CAST({_col} AS VARCHAR) AS val, COUNT(*) AS cnt
-        FROM read_parquet('{_s3}', hive_partitioning=1)
-        WHERE {_bp}
-        GROUP BY val
-        ORDER BY cnt DESC
-        LIMIT 30
-    """
-    _val_df = pl.from_pandas(conn.execute(_val_sql).fetchdf())
-    _chart = alt.Chart(_val_df.to_pandas()).mark_bar().encode(
+    _n_slice = conn.execute(f"SELECT COUNT(*) FROM {slice_table}").fetchone()[0]
+
+    if _n_slice < 50_000:
+        # Exact top 30; the window sum over all groups is the row total.
+        _val_sql = f"""
+            SELECT
+                CAST({_col} AS VARCHAR) AS val,
+                COUNT(*) AS cnt,
+                SUM(COUNT(*)) OVER () AS total
+            FROM {slice_table}
+            GROUP BY val
+            ORDER BY cnt DESC
+            LIMIT 30
+        """
+    else:
+        # Large slices: find the heavy hitters with a Space-Saving sketch,
+        # then count them in a pass that folds every other value into one
+        # NULL group, so at most 31 groups are hashed however many distinct
+        # values the column has.  The window sum still covers every row.
+        _val_sql = f"""
+            WITH top AS (
+                SELECT approx_top_k(CAST({_col} AS VARCHAR), 30) AS vals
+                FROM {slice_table}
+            ),
+            counted AS (
+                SELECT
+                    CASE WHEN list_contains(top.vals, CAST({_col} AS VARCHAR))
+                         THEN CAST({_col} AS VARCHAR) END AS val,
+                    COUNT(*) AS cnt,
+                    SUM(COUNT(*)) OVER () AS total
+                FROM {slice_table}, top
+                GROUP BY val
+            )
+            SELECT val, cnt, total
+            FROM counted
+            WHERE val IS NOT NULL
+            ORDER BY cnt DESC
+        """
+    _val_df = conn.execute(_val_sql).pl()
+    _chart = alt.Chart(_val_df).mark_bar().encode(
         x=alt.X("cnt:Q", title="Count"),
         y=alt.Y("val:N", sort="-x", title=_col),
     ).properties(width=500, height=min(400, len(_val_df) * 22))
 
-    mo.md(f"{mo.as_html(_chart)}")
+    _n_rows = int(_val_df["total"][0]) if len(_val_df) > 0 else 0
+
+    mo.md(f"Top {len(_val_df)} values of **{_n_rows:,}** rows\n\n{mo.as_html(_chart)}")
     return
 
 
+@app.cell
+def geometry_stats_toggle(mo):
+    exact_geom_stats = mo.ui.checkbox(label="Exact stats (decode every geometry)")
+    return (exact_geom_stats,)
+
+
 @app.cell
 def geometry_stats(
-    bbox, bbox_predicate, conn, mo, pl, s3_path, theme_dropdown, type_dropdown
+    conn, exact_geom_stats, mo, orjson, s3_path, slice_table, theme_dropdown,
+    type_dropdown
 ):
-    _s3 = s3_path(theme_dropdown.value, type_dropdown.value)
-    _bp = bbox_predicate(bbox)
+    # Declared geometry types come from the GeoParquet `geo` footer metadata,
+    # so no WKB is decoded to list them.  The key is identical across the
+    # release, so only the first file's footer is read.
+    _first_file = conn.execute(
+        "SELECT file FROM glob($path) LIMIT 1",
+        {"path": s3_path(theme_dropdown.value, type_dropdown.value)},
+    ).fetchone()
+    _geo_row = conn.execute(
+        """
+        SELECT decode(value) FROM parquet_kv_metadata($path)
+        WHERE decode(key) = 'geo'
+        """,
+        {"path": _first_file[0]},
+    ).fetchone() if _first_file else None
+    _declared = (
+        orjson.loads(_geo_row[0]).get("columns", {}).get("geometry", {}).get("geometry_types", [])
+        if _geo_row else []
+    )
+
+    # Sizes converge quickly: by default aggregate a 5,000-row reservoir
+    # sample instead of decoding every geometry in the slice.
+    _sample = "" if exact_geom_stats.value else "TABLESAMPLE reservoir(5000 ROWS)"
     _sql = f"""
         SELECT
             ST_GeometryType(geometry) AS geom_type,
             COUNT(*) AS count,
             COALESCE(ROUND(AVG(CASE WHEN ST_Area(geometry) > 0 THEN ST_Area(geometry) * 111320 * 111320 END), 1), 0) AS avg_area_m2,
             COALESCE(ROUND(AVG(CASE WHEN ST_Length(geometry) > 0 THEN ST_Length(geometry) * 111320 END), 1), 0) AS avg_length_m
-        FROM read_parquet('{_s3}', hive_partitioning=1)
-        WHERE {_bp}
+        FROM {slice_table} {_sample}
         GROUP BY geom_type
         ORDER BY count DESC
     """
-    geom_stats_df = pl.from_pandas(conn.execute(_sql).fetchdf()).fill_nan(0)
+    geom_stats_df = conn.execute(_sql).pl()
     mo.md(
         f"""
         ## Geometry Statistics
 
-        {mo.ui.table(geom_stats_df)}
+        **Declared types (GeoParquet metadata):** {", ".join(_declared) or "—"}
+
+        {exact_geom_stats}
+        {"" if exact_geom_stats.value else "*Counts and averages from a 5,000-row sample.*"}
+
+        {mo.ui.table(geom_stats_df, selection=None, page_size=25)}
         """
     )
     return
 
 
 @app.cell
-def null_analysis(
-    alt, bbox, bbox_predicate, conn, mo, pl, s3_path, schema_df,
-    theme_dropdown, type_dropdown
-):
-    _s3 = s3_path(theme_dropdown.value, type_dropdown.value)
-    _bp = bbox_predicate(bbox)
+def file_null_stats(conn, s3_path, theme_dropdown, type_dropdown):
+    # Null share over the whole release, summed from the row-group
+    # statistics in the Parquet footers — no column data is read.  It only
+    # depends on the theme and type, so bbox or city changes don't re-read
+    # every footer.  Nested columns have per-leaf stats and show no value.
+    file_null_df = conn.execute(
+        """
+        SELECT
+            path_in_schema AS "column",
+            ROUND(100.0 * SUM(stats_null_count) / GREATEST(SUM(row_group_num_rows), 1), 1)
+                AS file_null_pct
+        FROM parquet_metadata($path)
+        GROUP BY path_in_schema
+        """,
+        {"path": s3_path(theme_dropdown.value, type_dropdown.value)},
+    ).pl()
+    return (file_null_df,)
 
+
+@app.cell
+def null_analysis(alt, conn, file_null_df, mo, schema_df, slice_table):
     _cols = [
         r for r in schema_df["column_name"].to_list()
         if r not in ("geometry",)
     ]
 
-    _count_exprs = ", ".join(
-        f"COUNT({c}) AS {c}_nonnull" for c in _cols
-    )
-    _total_sql = f"""
-        SELECT COUNT(*) AS total, {_count_exprs}
-        FROM read_parquet('{_s3}', hive_partitioning=1)
-        WHERE {_bp}
+    # One aggregation pass, unpivoted to a row per column inside DuckDB,
+    # then joined to the release-wide file_null_pct from the footers.
+    _count_exprs = ", ".join(f'COUNT("{c}") AS "{c}"' for c in _cols)
+    _null_sql = f"""
+        WITH counts AS (
+            SELECT COUNT(*) AS __total, {_count_exprs}
+            FROM {slice_table}
+        )
+        SELECT
+            "column",
+            __total AS total,
+            non_null,
+            __total - non_null AS null_count,
+            ROUND(100.0 * (__total - non_null) / GREATEST(__total, 1), 1) AS null_pct
+        FROM (
+            UNPIVOT counts
+            ON COLUMNS(* EXCLUDE (__total))
+            INTO NAME "column" VALUE non_null
+        )
+        ORDER BY null_pct DESC
     """
-    _row = conn.execute(_total_sql).fetchone()
-    _total = _row[0]
-
-    _null_data = []
-    for _idx, _col in enumerate(_cols):
-        _nonnull = _row[_idx + 1]
-        _null_count = _total - _nonnull
-        _null_data.append({
-            "column": _col,
-            "total": _total,
-            "non_null": _nonnull,
-            "null_count": _null_count,
-            "null_pct": round(_null_count / max(_total, 1) * 100, 1),
-        })
-
-    null_df = pl.DataFrame(_null_data).sort("null_pct", descending=True).fill_nan(None)
+    null_df = conn.execute(_null_sql).pl().join(
+        file_null_df, on="column", how="left", maintain_order="left"
+    )
+    _total = null_df["total"][0] if len(null_df) > 0 else 0
 
     _chart = (
-        alt.Chart(null_df.to_pandas())
+        alt.Chart(null_df)
         .mark_bar()
         .encode(
             x=alt.X("null_pct:Q", title="Null %", scale=alt.Scale(domain=[0, 100])),
@@ -383,55 +522,21 @@ def null_analysis(
 
         {mo.as_html(_chart)}
 
-        {mo.ui.table(null_df)}
+        {mo.ui.table(null_df, selection=None, page_size=25)}
         """
     )
     return
 
 
 @app.cell
-def pmtiles_metadata(PMTILES_URLS, json, mo, requests, theme_dropdown):
+def pmtiles_metadata(PMTILES_URLS, json, mo, read_pmtiles_metadata, theme_dropdown):
     _url = PMTILES_URLS.get(theme_dropdown.value)
     if _url is None:
         pmtiles_meta = None
         mo.md(f"## PMTiles Metadata\n\nNo PMTiles URL for theme `{theme_dropdown.value}`.")
     else:
         try:
-            _resp = requests.get(_url, headers={"Range": "bytes=0-524287"})
-            _data = _resp.content
-
-            _magic = _data[:7]
-            if _magic == b"PMTiles":
-                _version = _data[7]
-                _meta_offset = int.from_bytes(_data[38:46], "little")
-                _meta_length = int.from_bytes(_data[46:54], "little")
-                _min_zoom = _data[70]
-                _max_zoom = _data[71]
-
-                _info = {
-                    "version": _version,
-                    "min_zoom": _min_zoom,
-                    "max_zoom": _max_zoom,
-                    "url": _url,
-                    "header_bytes": len(_data),
-                }
-
-                if _meta_offset + _meta_length <= len(_data) and _meta_length > 0:
-                    import gzip as _gzip
-                    try:
-                        _meta_raw = _gzip.decompress(
-                            _data[_meta_offset : _meta_offset + _meta_length]
-                        )
-                        _meta_json = json.loads(_meta_raw)
-                        _info["metadata"] = _meta_json
-                    except Exception:
-                        _info["metadata_note"] = "Could not decompress metadata in first 512KB"
-                else:
-                    _info["metadata_note"] = f"Metadata at offset {_meta_offset} (len {_meta_length}), beyond fetched range"
-
-                pmtiles_meta = _info
-            else:
-                pmtiles_meta = {"error": "Not a PMTiles v3 file", "magic": str(_magic)}
+            pmtiles_meta = read_pmtiles_metadata(_url)
         except Exception as _e:
             pmtiles_meta = {"error": str(_e)}
 
@@ -462,7 +567,7 @@ def pmtiles_metadata(PMTILES_URLS, json, mo, requests, theme_dropdown):
 @app.cell
 def pmtiles_tile_sample(
     CITIES, PMTILES_URLS, city_dropdown, json, latlng_to_tile, mo,
-    requests, theme_dropdown
+    pmtiles_range_source, theme_dropdown
 ):
     _url = PMTILES_URLS.get(theme_dropdown.value)
     _preset = CITIES[city_dropdown.value]
@@ -472,21 +577,15 @@ def pmtiles_tile_sample(
         mo.md("## PMTiles Tile Sample\n\nNo PMTiles URL for this theme.")
     else:
         try:
+            import gzip as _gzip
             import mapbox_vector_tile as _mvt
             from pmtiles.reader import Reader as _Reader
+            from pmtiles.tile import Compression as _Compression
 
-            class _HttpSource:
-                def __init__(self, url):
-                    self.url = url
-
-                def get(self, offset, length):
-                    _headers = {"Range": f"bytes={offset}-{offset + length - 1}"}
-                    _r = requests.get(self.url, headers=_headers)
-                    return _r.content
-
-            _source = _HttpSource(_url)
-            _reader = _Reader(_source)
+            _reader = _Reader(pmtiles_range_source(_url))
             _tile_data = _reader.get(_z, _x, _y)
+            if _tile_data is not None and _reader.header()["tile_compression"] == _Compression.GZIP:
+                _tile_data = _gzip.decompress(_tile_data)
 
             if _tile_data is None:
                 mo.md(
@@ -521,7 +620,7 @@ def pmtiles_tile_sample(
 
                     **Tile:** z={_z} x={_x} y={_y} | **Location:** {_preset.name}
 
-                    {mo.ui.table(_summary_df)}
+                    {mo.ui.table(_summary_df, selection=None, page_size=25)}
 
                     {_sample_props_md}
                     """
@@ -532,7 +631,7 @@ def pmtiles_tile_sample(
 
 
 @app.cell
-def format_comparison(mo, pmtiles_meta, schema_df):
+def format_comparison(mo, pl, pmtiles_meta, schema_df):
     _gp_cols = set(schema_df["column_name"].to_list())
 
     _pm_cols = set()
@@ -542,21 +641,28 @@ def format_comparison(mo, pmtiles_meta, schema_df):
             for _vl in _m["vector_layers"]:
                 _pm_cols.update(_vl.get("fields", {}).keys())
 
-    _all_cols = sorted(_gp_cols | _pm_cols)
-    _comparison = []
-    for _col in _all_cols:
-        _comparison.append({
-            "column": _col,
-            "in_geoparquet": "yes" if _col in _gp_cols else "",
-            "in_pmtiles": "yes" if _col in _pm_cols else "",
-            "only_in": (
-                "GeoParquet" if _col in _gp_cols and _col not in _pm_cols
-                else ("PMTiles" if _col in _pm_cols and _col not in _gp_cols else "Both")
-            ),
-        })
-
-    import polars as _pl
-    _comp_df = _pl.DataFrame(_comparison)
+    _gp = pl.DataFrame(
+        {"column": sorted(_gp_cols), "in_gp": True},
+        schema={"column": pl.String, "in_gp": pl.Boolean},
+    )
+    _pm = pl.DataFrame(
+        {"column": sorted(_pm_cols), "in_pm": True},
+        schema={"column": pl.String, "in_pm": pl.Boolean},
+    )
+    _comp_df = (
+        _gp.join(_pm, on="column", how="full", coalesce=True)
+        .with_columns(pl.col("in_gp", "in_pm").fill_null(False))
+        .select(
+            "column",
+            pl.when(pl.col("in_gp")).then(pl.lit("yes")).otherwise(pl.lit("")).alias("in_geoparquet"),
+            pl.when(pl.col("in_pm")).then(pl.lit("yes")).otherwise(pl.lit("")).alias("in_pmtiles"),
+            pl.when(pl.col("in_gp") & pl.col("in_pm")).then(pl.lit("Both"))
+            .when(pl.col("in_gp")).then(pl.lit("GeoParquet"))
+            .otherwise(pl.lit("PMTiles"))
+            .alias("only_in"),
+        )
+        .sort("column")
+    )
 
     mo.md(
         f"""
@@ -569,7 +675,7 @@ def format_comparison(mo, pmtiles_meta, schema_df):
         | PMTiles-only | — | {len(_pm_cols - _gp_cols)} |
         | Shared | {len(_gp_cols & _pm_cols)} | {len(_gp_cols & _pm_cols)} |
 
-        {mo.ui.table(_comp_df)}
+        {mo.ui.table(_comp_df, selection=None, page_size=25)}
         """
     )
     return
@@ -599,85 +705,16 @@ def metric_column_mapping(METRIC_COLUMN_MAP, mo, pl):
 
         Which Overture columns does each chrono.city metric need?
 
-        {mo.ui.table(metric_df)}
+        {mo.ui.table(metric_df, selection=None, page_size=25)}
         """
     )
     return
 
 
 @app.cell
-def stac_catalog_browser(json, mo, requests):
+def stac_catalog_browser(STAC_CATALOG_URL, crawl_stac_collections, mo, orjson):
     try:
-        _catalog = requests.get(
-            "https://labs.overturemaps.org/stac/catalog.json", timeout=15
-        ).json()
-
-        _collections = []
-
-        _links = [
-            _l for _l in _catalog.get("links", []) if _l.get("rel") == "child"
-        ]
-        for _link in _links:
-            _href = _link.get("href", "")
-            if not _href.startswith("http"):
-                _href = "https://labs.overturemaps.org/stac/" + _href
-            try:
-                _child = requests.get(_href, timeout=15).json()
-                _child_title = _child.get("title", _child.get("id", "unknown"))
-
-                _sub_links = [
-                    _sl for _sl in _child.get("links", [])
-                    if _sl.get("rel") == "child"
-                ]
-                if _sub_links:
-                    for _sl in _sub_links:
-                        _sub_href = _sl.get("href", "")
-                        if not _sub_href.startswith("http"):
-                            _base = _href.rsplit("/", 1)[0]
-                            _sub_href = _base + "/" + _sub_href
-                        try:
-                            _sub = requests.get(_sub_href, timeout=15).json()
-                            _extent = _sub.get("extent", {})
-                            _spatial = _extent.get("spatial", {}).get("bbox", [])
-                            _temporal = _extent.get("temporal", {}).get("interval", [])
-                            _collections.append({
-                                "theme": _child_title,
-                                "collection": _sub.get("title", _sub.get("id", "?")),
-                                "id": _sub.get("id", "?"),
-                                "description": (_sub.get("description", "")[:120]),
-                                "bbox": str(_spatial[0]) if _spatial else "—",
-                                "temporal": str(_temporal[0]) if _temporal else "—",
-                            })
-                        except Exception:
-                            _collections.append({
-                                "theme": _child_title,
-                                "collection": _sl.get("title", "?"),
-                                "id": "?",
-                                "description": f"Failed to fetch: {_sub_href}",
-                                "bbox": "—",
-                                "temporal": "—",
-                            })
-                else:
-                    _extent = _child.get("extent", {})
-                    _spatial = _extent.get("spatial", {}).get("bbox", [])
-                    _temporal = _extent.get("temporal", {}).get("interval", [])
-                    _collections.append({
-                        "theme": "—",
-                        "collection": _child_title,
-                        "id": _child.get("id", "?"),
-                        "description": (_child.get("description", "")[:120]),
-                        "bbox": str(_spatial[0]) if _spatial else "—",
-                        "temporal": str(_temporal[0]) if _temporal else "—",
-                    })
-            except Exception:
-                _collections.append({
-                    "theme": "—",
-                    "collection": _link.get("title", "?"),
-                    "id": "?",
-                    "description": f"Failed to fetch: {_href}",
-                    "bbox": "—",
-                    "temporal": "—",
-                })
+        _catalog, _collections = crawl_stac_collections(STAC_CATALOG_URL)
 
         import polars as _pl
         stac_df = _pl.DataFrame(_collections)
@@ -692,12 +729,12 @@ def stac_catalog_browser(json, mo, requests):
 
             Found **{len(_collections)}** collections:
 
-            {mo.ui.table(stac_df)}
+            {mo.ui.table(stac_df, selection=None, page_size=25)}
 
             ### Raw catalog metadata
 
             ```json
-            {json.dumps({k: v for k, v in _catalog.items() if k != 'links'}, indent=2)}
+            {orjson.dumps({k: v for k, v in _catalog.items() if k != 'links'}, option=orjson.OPT_INDENT_2).decode()}
             ```
             """
         )
@@ -733,7 +770,7 @@ def stac_collection_selector(mo, stac_df):
 
 
 @app.cell
-def stac_collection_detail(json, mo, requests, stac_collection_dd):
+def stac_collection_detail(mo, orjson, stac_collection_dd, stac_session):
     mo.stop(stac_collection_dd is None, mo.md(""))
 
     _collection_id = stac_collection_dd.value
@@ -743,8 +780,8 @@ def stac_collection_detail(json, mo, requests, stac_collection_dd):
         try:
             _base = "https://labs.overturemaps.org/stac"
             _url = f"{_base}/{_collection_id}/collection.json"
-            _resp = requests.get(_url, timeout=15)
-            _detail = _resp.json() if _resp.status_code == 200 else None
+            _resp = stac_session.get(_url, timeout=15)
+            _detail = orjson.loads(_resp.content) if _resp.status_code == 200 else None
 
             if _detail:
                 _providers = _detail.get("providers", [])
@@ -763,7 +800,7 @@ def stac_collection_detail(json, mo, requests, stac_collection_dd):
                 for _ak, _av in list(_assets.items())[:10]:
                     _detail_md += f"| `{_ak}` | {_av.get('type', '?')} | `{_av.get('href', '?')[:80]}` |\n"
 
-                _detail_md += f"\n```json\n{json.dumps(_detail, indent=2, default=str)[:3000]}\n```"
+                _detail_md += f"\n```json\n{orjson.dumps(_detail, option=orjson.OPT_INDENT_2, default=str).decode()[:3000]}\n```"
         except Exception as _e:
             _detail_md = f"Error fetching collection detail: {_e}"
 
@@ -794,17 +831,16 @@ def custom_sql(mo):
 
 
 @app.cell
-def custom_sql_result(conn, mo, pl, run_button, sql_input):
+def custom_sql_result(conn, mo, run_button, sql_input):
     mo.stop(not run_button.value, mo.md("*Click 'Execute query' to run.*"))
 
     try:
-        _result = conn.execute(sql_input.value).fetchdf()
-        _result_df = pl.from_pandas(_result)
+        _result_df = conn.execute(sql_input.value).pl()
         mo.md(
             f"""
             ### Query Result ({len(_result_df)} rows)
 
-            {mo.ui.table(_result_df)}
+            {mo.ui.table(_result_df, selection=None, page_size=25)}
             """
         )
     except Exception as _e:
@@ -7,9 +7,7 @@ app = marimo.App(width="medium")
 @app.cell
 def _():
     import marimo as mo
-    import duckdb
     import polars as pl
-    import altair as alt
     import math
     import sys
     import os
@@ -22,23 +20,24 @@ def _():
         init_duckdb,
         bbox_from_center,
         bbox_predicate,
-        pedshed_filter,
+        local_projection,
         pedshed_area_m2,
         pedshed_area_ha,
+        persistent_table,
     )
 
     return (
         CITIES,
         S3_BUILDINGS,
-        alt,
         bbox_from_center,
         bbox_predicate,
         init_duckdb,
+        local_projection,
         math,
         mo,
         pedshed_area_ha,
         pedshed_area_m2,
-        pedshed_filter,
+        persistent_table,
         pl,
     )
 
@@ -57,9 +56,11 @@ def city_selector(CITIES, mo):
         value=_default_preset.name,
         label="City preset",
     )
+    # Buildings are fetched once per city at the largest radius
+    max_radius = 2000
     radius_m = mo.ui.slider(
         start=400,
-        stop=2000,
+        stop=max_radius,
         step=100,
         value=1200,
         label="Pedshed radius (m)",
@@ -74,7 +75,7 @@ def city_selector(CITIES, mo):
 
     {radius_m}
     """)
-    return city_dropdown, radius_m
+    return city_dropdown, max_radius, radius_m
 
 
 @app.cell
@@ -113,62 +114,196 @@ def compute_bbox(
 
 
 @app.cell
-def buildings_raw_query(
+def buildings_cache(
+    CITIES,
     S3_BUILDINGS,
+    bbox_from_center,
     bbox_predicate,
+    city_dropdown,
     conn,
-    mo,
-    pedshed_filter,
-    study_bbox,
-    study_lat,
-    study_lng,
-    study_radius,
+    local_projection,
+    max_radius,
+    persistent_table,
 ):
-    _bbox_pred = bbox_predicate(study_bbox)
-    _circle_pred = pedshed_filter(study_lat, study_lng, study_radius)
-
+    # Keyed on the city only: moving the radius slider filters this local
+    # table instead of re-scanning S3, since every smaller pedshed is a
+    # subset of the largest one.  The table is kept on disk, so reruns and
+    # restarts skip S3 entirely.  The pedshed is a metric circle: the bbox
+    # predicate prunes the scan and dist_m, in metres, trims it to
+    # max_radius, so every slider radius sees the full circle.
+    _city = CITIES[city_dropdown.value]
+    _bbox_pred = bbox_predicate(bbox_from_center(_city.lat, _city.lng, max_radius))
+    _proj = local_projection(_city.lat, _city.lng)
+
+    # Project once into a local equal-area CRS so area and perimeter are
+    # planar float math rather than per-row geodesic computations.  The CRS
+    # is centred on the city, so distance to the origin is distance to the
+    # centre and the geometry itself need not be kept.
     _sql = f"""
+    WITH projected AS (
+        SELECT
+            ST_Transform(geometry, 'EPSG:4326', '{_proj}', always_xy := true) as geom,
+            COALESCE(
+                num_floors,
+                CASE WHEN height IS NOT NULL
+                     THEN GREATEST(ROUND(height / 3.5), 1)
+                     ELSE NULL
+                END
+            ) as est_floors,
+            height
+        FROM read_parquet('{S3_BUILDINGS}', hive_partitioning=1)
+        WHERE {_bbox_pred}
+    )
     SELECT
-        ST_Area_Spheroid(geometry) as area_m2,
-        (4 * PI() * ST_Area_Spheroid(geometry))
-            / POWER(ST_Perimeter_Spheroid(geometry), 2) as compactness,
-        ST_Perimeter_Spheroid(geometry) as perimeter_m,
-        COALESCE(
-            num_floors,
-            CASE WHEN height IS NOT NULL
-                 THEN GREATEST(ROUND(height / 3.5), 1)
-                 ELSE NULL
-            END
-        ) as est_floors,
-        height,
-        num_floors
-    FROM read_parquet('{S3_BUILDINGS}', hive_partitioning=1)
-    WHERE {_bbox_pred}
-        AND {_circle_pred}
+        ST_Area(geom) as area_m2,
+        ST_Perimeter(geom) as perimeter_m,
+        ST_Distance(geom, ST_Point(0, 0)) as dist_m,
+        est_floors,
+        height
+    FROM projected
+    WHERE ST_Distance(geom, ST_Point(0, 0)) <= {max_radius}
     """
+    buildings_table = persistent_table(
+        conn, f"ch1_buildings:{city_dropdown.value}:{max_radius}", _sql
+    )
+    return (buildings_table,)
+
 
-    buildings_df = conn.execute(_sql).pl()
-    building_count = len(buildings_df)
+@app.cell
+def buildings_raw_query(buildings_table, conn, mo, study_radius):
+    _buildings_cte = f"""
+    WITH buildings AS (
+        SELECT
+            area_m2,
+            perimeter_m,
+            (4 * PI() * area_m2) / (perimeter_m * perimeter_m) as compactness,
+            est_floors,
+            height
+        FROM {buildings_table}
+        WHERE dist_m <= {study_radius}
+    )
+    """
+
+    # Every metric input in one aggregation: a single row comes back
+    # instead of one row per building, and the metric cells below only
+    # derive ratios from these scalars and render them.
+    _stats_sql = _buildings_cte + """
+    SELECT
+        COUNT(*) AS building_count,
+        COALESCE(SUM(area_m2), 0) AS total_footprint,
+        COUNT(est_floors) AS with_floors,
+        COALESCE(SUM(area_m2 * est_floors), 0) AS gfa,
+        COUNT(*) FILTER (WHERE compactness > 0 AND compactness <= 1) AS valid_compactness,
+        COALESCE(AVG(compactness) FILTER (WHERE compactness > 0 AND compactness <= 1), 0)
+            AS avg_compactness,
+        -- t-digest estimate: ample for the 150 / 500 m^2 grain buckets
+        COALESCE(approx_quantile(area_m2, 0.5), 0) AS median_footprint,
+        COALESCE(SUM(perimeter_m), 0) AS total_perimeter
+    FROM buildings
+    """
+    # One row: fetch it as Python scalars, no Arrow/Polars frame needed
+    _cursor = conn.execute(_stats_sql)
+    fabric_stats = dict(zip([_d[0] for _d in _cursor.description], _cursor.fetchone()))
+    building_count = fabric_stats["building_count"]
+
+    # Histograms are binned here so charts receive ~100 rows, not one per
+    # building.  Footprint area is binned on log10 for its log-scale axis.
+    _hist_sql = _buildings_cte + """,
+    vals AS (
+        SELECT 'area_m2' AS metric, 40 AS n, log10(area_m2) AS v
+        FROM buildings WHERE area_m2 > 0
+        UNION ALL
+        SELECT 'compactness', 30, compactness
+        FROM buildings WHERE compactness > 0 AND compactness <= 1
+        UNION ALL
+        SELECT 'height', 30, height
+        FROM buildings WHERE height IS NOT NULL
+    ),
+    bounds AS (
+        SELECT
+            metric,
+            MIN(v) AS lo,
+            CASE WHEN MAX(v) > MIN(v) THEN (MAX(v) - MIN(v)) / n ELSE 1 END AS w
+        FROM vals
+        GROUP BY metric, n
+    ),
+    binned AS (
+        SELECT metric, lo, w, LEAST(FLOOR((v - lo) / w), n - 1) AS bin
+        FROM vals JOIN bounds USING (metric)
+    )
+    SELECT
+        metric,
+        CASE WHEN metric = 'area_m2' THEN POWER(10, lo + bin * w)
+             ELSE lo + bin * w END AS bin_start,
+        CASE WHEN metric = 'area_m2' THEN POWER(10, lo + (bin + 1) * w)
+             ELSE lo + (bin + 1) * w END AS bin_end,
+        COUNT(*) AS buildings
+    FROM binned
+    GROUP BY metric, lo, w, bin
+    ORDER BY metric, bin_start
+    """
+    histogram_df = conn.execute(_hist_sql).pl()
 
     mo.md(f"""
     ### Buildings Query
 
-    Fetched **{building_count:,}** buildings within the pedshed.
+    Aggregated **{building_count:,}** buildings within the pedshed.
     """)
-    return building_count, buildings_df
+    return building_count, fabric_stats, histogram_df
 
 
 @app.cell
-def compute_gsi(buildings_df, mo, study_area_m2):
-    _total_footprint = buildings_df["area_m2"].sum()
-    gsi = _total_footprint / study_area_m2
+def interpretation_bands():
+    # metric → ((low, high), labels below low / between / above high), each
+    # label a (summary note, full interpretation) pair.  Bounds follow the
+    # prose: "< low" and "> high" are the outer bands, both ends inclusive
+    # in the middle one.
+    INTERPRETATION_BANDS = {
+        "gsi": ((0.15, 0.5), [
+            ("Sprawl", "Sprawl / very low coverage (<0.15)"),
+            ("Moderate", "Moderate coverage (0.15 - 0.50)"),
+            ("Compact", "Compact urban fabric (>0.5)"),
+        ]),
+        "fsi": ((0.5, 2.0), [
+            ("Low intensity", "Low intensity"),
+            ("Moderate intensity", "Moderate intensity"),
+            ("High intensity", "High intensity"),
+        ]),
+        "osr": ((0.5, 2.0), [
+            ("Cramped", "Low — cramped, little open space per unit of floor area"),
+            ("Balanced", "Moderate — balanced open space ratio"),
+            ("Spacious", "High — spacious, generous open space per unit of floor area"),
+        ]),
+        "compactness": ((0.4, 0.7), [
+            ("Complex shapes", "Low — buildings have irregular, complex shapes"),
+            ("Typical shapes", "Moderate — typical urban building shapes"),
+            ("Regular shapes", "High — buildings are relatively circular / regular"),
+        ]),
+        "grain": ((150, 500), [
+            ("Fine grain (<150 m^2)", "Fine grain (<150 m^2)"),
+            ("Medium grain (150-500 m^2)", "Medium grain (150-500 m^2)"),
+            ("Coarse grain (>500 m^2)", "Coarse grain (>500 m^2)"),
+        ]),
+        "fractal_d": ((1.3, 1.5), [
+            ("Planned / regular", "Low (<1.3) — planned, regular geometry"),
+            ("Grid-based", "Moderate (1.3-1.5) — grid-based urban form"),
+            ("Organic / mature", "High (>1.5) — organic, mature urban fabric"),
+        ]),
+    }
+
+    def interpret(metric: str, value: float) -> tuple[str, str]:
+        """Return the (note, interpretation) band ``value`` falls in."""
+        (_low, _high), _labels = INTERPRETATION_BANDS[metric]
+        return _labels[(value >= _low) + (value > _high)]
+
+    return INTERPRETATION_BANDS, interpret
 
-    if gsi > 0.5:
-        _gsi_interp = "Compact urban fabric (>0.5)"
-    elif gsi < 0.15:
-        _gsi_interp = "Sprawl / very low coverage (<0.15)"
-    else:
-        _gsi_interp = "Moderate coverage (0.15 - 0.50)"
+
+@app.cell
+def compute_gsi(fabric_stats, interpret, mo, study_area_m2):
+    _total_footprint = fabric_stats["total_footprint"]
+    gsi = _total_footprint / study_area_m2
+    _gsi_interp = interpret("gsi", gsi)[1]
 
     mo.md(f"""
     ### 1. GSI — Ground Space Index
@@ -186,11 +321,11 @@ def compute_gsi(buildings_df, mo, study_area_m2):
 
 
 @app.cell
-def compute_fsi(building_count, buildings_df, mo, pl, study_area_m2):
-    _with_floors = buildings_df.filter(pl.col("est_floors").is_not_null())
-    _floors_coverage = len(_with_floors) / building_count if building_count > 0 else 0.0
+def compute_fsi(building_count, fabric_stats, mo, study_area_m2):
+    _with_floors = fabric_stats["with_floors"]
+    _floors_coverage = _with_floors / building_count if building_count > 0 else 0.0
 
-    _gfa = (_with_floors["area_m2"] * _with_floors["est_floors"]).sum()
+    _gfa = fabric_stats["gfa"]
     fsi = _gfa / study_area_m2
 
     mo.md(f"""
@@ -200,7 +335,7 @@ def compute_fsi(building_count, buildings_df, mo, pl, study_area_m2):
 
     Estimated gross floor area: {_gfa:,.0f} m^2
 
-    Buildings with floor data: {len(_with_floors):,} / {building_count:,} ({_floors_coverage:.1%})
+    Buildings with floor data: {_with_floors:,} / {building_count:,} ({_floors_coverage:.1%})
 
     > FSI measures the total floor area relative to the study area.
     > Higher FSI indicates more intense use of land (more floors stacked up).
@@ -209,15 +344,9 @@ def compute_fsi(building_count, buildings_df, mo, pl, study_area_m2):
 
 
 @app.cell
-def compute_osr(fsi, gsi, mo):
+def compute_osr(fsi, gsi, interpret, mo):
     osr = (1 - gsi) / fsi if fsi > 0 else float("inf")
-
-    if osr < 0.5:
-        _osr_interp = "Low — cramped, little open space per unit of floor area"
-    elif osr > 2.0:
-        _osr_interp = "High — spacious, generous open space per unit of floor area"
-    else:
-        _osr_interp = "Moderate — balanced open space ratio"
+    _osr_interp = interpret("osr", osr)[1]
 
     mo.md(f"""
     ### 3. OSR — Open Space Ratio
@@ -234,29 +363,16 @@ def compute_osr(fsi, gsi, mo):
 
 
 @app.cell
-def compute_compactness(buildings_df, mo, pl):
-    _valid = buildings_df.filter(
-        pl.col("compactness").is_not_null()
-        & pl.col("compactness").is_finite()
-        & (pl.col("compactness") > 0)
-        & (pl.col("compactness") <= 1.0)
-    )
-
-    avg_compactness = _valid["compactness"].mean() if len(_valid) > 0 else 0.0
-
-    if avg_compactness > 0.7:
-        _compact_interp = "High — buildings are relatively circular / regular"
-    elif avg_compactness < 0.4:
-        _compact_interp = "Low — buildings have irregular, complex shapes"
-    else:
-        _compact_interp = "Moderate — typical urban building shapes"
+def compute_compactness(fabric_stats, interpret, mo):
+    avg_compactness = fabric_stats["avg_compactness"]
+    _compact_interp = interpret("compactness", avg_compactness)[1]
 
     mo.md(f"""
     ### 4. Building Compactness
 
     **Mean compactness = {avg_compactness:.4f}** (isoperimetric quotient)
 
-    Valid buildings: {len(_valid):,} (excluded null/invalid values)
+    Valid buildings: {fabric_stats["valid_compactness"]:,} (excluded null/invalid values)
 
     *Interpretation:* {_compact_interp}
 
@@ -267,16 +383,9 @@ def compute_compactness(buildings_df, mo, pl):
 
 
 @app.cell
-def compute_urban_grain(buildings_df, mo):
-    _median_footprint = buildings_df["area_m2"].median()
-    median_footprint = _median_footprint if _median_footprint is not None else 0.0
-
-    if median_footprint < 150:
-        grain_class = "Fine grain (<150 m^2)"
-    elif median_footprint > 500:
-        grain_class = "Coarse grain (>500 m^2)"
-    else:
-        grain_class = "Medium grain (150-500 m^2)"
+def compute_urban_grain(fabric_stats, interpret, mo):
+    median_footprint = fabric_stats["median_footprint"]
+    grain_class = interpret("grain", median_footprint)[1]
 
     mo.md(f"""
     ### 5. Urban Grain
@@ -293,21 +402,17 @@ def compute_urban_grain(buildings_df, mo):
 
 
 @app.cell
-def compute_fractal_dimension(buildings_df, math, mo):
-    _total_perimeter = buildings_df["perimeter_m"].sum()
-    _total_area = buildings_df["area_m2"].sum()
-
-    if _total_area > 0 and _total_perimeter > 4:
-        fractal_d = 2 * math.log(_total_perimeter / 4) / math.log(_total_area)
+def compute_fractal_dimension(fabric_stats, interpret, math, mo):
+    _total_perimeter = fabric_stats["total_perimeter"]
+    _total_area = fabric_stats["total_footprint"]
+
+    # Both sums come from the shared DuckDB aggregation; only the log
+    # runs in Python.  ln(area) must be positive, so area has to exceed 1 m^2.
+    if _total_area > 1 and _total_perimeter > 4:
+        fractal_d = 2 * math.log(_total_perimeter / 4, _total_area)
     else:
         fractal_d = 0.0
-
-    if fractal_d < 1.3:
-        _fd_interp = "Low (<1.3) — planned, regular geometry"
-    elif fractal_d > 1.5:
-        _fd_interp = "High (>1.5) — organic, mature urban fabric"
-    else:
-        _fd_interp = "Moderate (1.3-1.5) — grid-based urban form"
+    _fd_interp = interpret("fractal_d", fractal_d)[1]
 
     mo.md(f"""
     ### 6. Fractal Dimension (proxy)
@@ -333,51 +438,12 @@ def summary_table(
     fsi,
     grain_class,
     gsi,
+    interpret,
     median_footprint,
     mo,
     osr,
     pl,
 ):
-    # GSI interpretation
-    if gsi > 0.5:
-        _gsi_note = "Compact"
-    elif gsi < 0.15:
-        _gsi_note = "Sprawl"
-    else:
-        _gsi_note = "Moderate"
-
-    # FSI interpretation
-    if fsi > 2.0:
-        _fsi_note = "High intensity"
-    elif fsi < 0.5:
-        _fsi_note = "Low intensity"
-    else:
-        _fsi_note = "Moderate intensity"
-
-    # OSR interpretation
-    if osr < 0.5:
-        _osr_note = "Cramped"
-    elif osr > 2.0:
-        _osr_note = "Spacious"
-    else:
-        _osr_note = "Balanced"
-
-    # Compactness interpretation
-    if avg_compactness > 0.7:
-        _compact_note = "Regular shapes"
-    elif avg_compactness < 0.4:
-        _compact_note = "Complex shapes"
-    else:
-        _compact_note = "Typical shapes"
-
-    # Fractal interpretation
-    if fractal_d < 1.3:
-        _fd_note = "Planned / regular"
-    elif fractal_d > 1.5:
-        _fd_note = "Organic / mature"
-    else:
-        _fd_note = "Grid-based"
-
     summary_df = pl.DataFrame({
         "Metric": [
             "GSI (Ground Space Index)",
@@ -404,12 +470,12 @@ def summary_table(
             "dimensionless",
         ],
         "Interpretation": [
-            _gsi_note,
-            _fsi_note,
-            _osr_note,
-            _compact_note,
+            interpret("gsi", gsi)[0],
+            interpret("fsi", fsi)[0],
+            interpret("osr", osr)[0],
+            interpret("compactness", avg_compactness)[0],
             grain_class,
-            _fd_note,
+            interpret("fractal_d", fractal_d)[0],
         ],
     })
 
@@ -424,70 +490,65 @@ def summary_table(
 
 
 @app.cell
-def visualizations(alt, buildings_df, mo, pl):
-    # --- Footprint area distribution (log scale) ---
-    _fp = buildings_df.filter(pl.col("area_m2") > 0).select(
-        pl.col("area_m2").alias("area")
-    )
+def chart_imports():
+    # Only the chart cells depend on Altair, so its import (pandas,
+    # jsonschema, ...) no longer sits upstream of the DuckDB queries.
+    import altair as alt
 
+    return (alt,)
+
+
+@app.cell
+def visualizations(alt, histogram_df, mo, pl):
+    # Bins come precomputed from DuckDB; each panel filters its metric
+    # from the one shared frame.
+    _base = alt.Chart(histogram_df).mark_bar(opacity=0.7)
+    _y = alt.Y("buildings:Q", title="Number of buildings")
+
+    # --- Footprint area distribution (log scale) ---
     footprint_chart = (
-        alt.Chart(_fp.to_pandas())
-        .mark_bar(opacity=0.7, color="#4c78a8")
+        _base.transform_filter(alt.datum.metric == "area_m2")
         .encode(
             x=alt.X(
-                "area:Q",
+                "bin_start:Q",
                 scale=alt.Scale(type="log"),
-                bin=alt.Bin(maxbins=40),
                 title="Footprint area (m2, log scale)",
             ),
-            y=alt.Y("count()", title="Number of buildings"),
+            x2="bin_end:Q",
+            y=_y,
+            color=alt.value("#4c78a8"),
         )
         .properties(width=500, height=250, title="Footprint Area Distribution")
     )
 
     # --- Compactness distribution ---
-    _cmp = buildings_df.filter(
-        pl.col("compactness").is_not_null()
-        & pl.col("compactness").is_finite()
-        & (pl.col("compactness") > 0)
-        & (pl.col("compactness") <= 1.0)
-    ).select(pl.col("compactness"))
-
     compactness_chart = (
-        alt.Chart(_cmp.to_pandas())
-        .mark_bar(opacity=0.7, color="#f58518")
+        _base.transform_filter(alt.datum.metric == "compactness")
         .encode(
-            x=alt.X(
-                "compactness:Q",
-                bin=alt.Bin(maxbins=30),
-                title="Compactness (isoperimetric quotient)",
-            ),
-            y=alt.Y("count()", title="Number of buildings"),
+            x=alt.X("bin_start:Q", title="Compactness (isoperimetric quotient)"),
+            x2="bin_end:Q",
+            y=_y,
+            color=alt.value("#f58518"),
         )
         .properties(width=500, height=250, title="Compactness Distribution")
     )
 
     # --- Height distribution (where available) ---
-    _ht = buildings_df.filter(
-        pl.col("height").is_not_null()
-    ).select(pl.col("height"))
+    _height_count = histogram_df.filter(pl.col("metric") == "height")["buildings"].sum()
 
-    if len(_ht) > 0:
+    if _height_count > 0:
         height_chart = (
-            alt.Chart(_ht.to_pandas())
-            .mark_bar(opacity=0.7, color="#e45756")
+            _base.transform_filter(alt.datum.metric == "height")
             .encode(
-                x=alt.X(
-                    "height:Q",
-                    bin=alt.Bin(maxbins=30),
-                    title="Height (m)",
-                ),
-                y=alt.Y("count()", title="Number of buildings"),
+                x=alt.X("bin_start:Q", title="Height (m)"),
+                x2="bin_end:Q",
+                y=_y,
+                color=alt.value("#e45756"),
             )
             .properties(
                 width=500,
                 height=250,
-                title=f"Height Distribution ({len(_ht):,} buildings with data)",
+                title=f"Height Distribution ({_height_count:,} buildings with data)",
             )
         )
     else:
@@ -513,8 +574,11 @@ def spacematrix_plot(alt, fsi, gsi, mo):
         {"label": "High-Rise",       "x": 0.15, "x2": 0.45, "y": 3.00, "y2": 8.00},
     ]
 
+    # Each dataset is tiny; layers share one base chart so its values are
+    # written into the spec once.
+    _zones_base = alt.Chart(alt.Data(values=_zones))
     _zones_chart = (
-        alt.Chart(alt.Data(values=_zones))
+        _zones_base
         .mark_rect(opacity=0.08, stroke="#888", strokeWidth=0.5)
         .encode(
             x=alt.X("x:Q"),
@@ -525,7 +589,7 @@ def spacematrix_plot(alt, fsi, gsi, mo):
     )
 
     _zone_labels = (
-        alt.Chart(alt.Data(values=_zones))
+        _zones_base
         .mark_text(align="left", baseline="top", fontSize=10, opacity=0.5)
         .encode(
             x="x:Q",
@@ -534,9 +598,11 @@ def spacematrix_plot(alt, fsi, gsi, mo):
         )
     )
 
-    _point_data = [{"GSI": gsi, "FSI": fsi, "label": "Current pedshed"}]
+    _point_base = alt.Chart(
+        alt.Data(values=[{"GSI": gsi, "FSI": fsi, "label": "Current pedshed"}])
+    )
     _point = (
-        alt.Chart(alt.Data(values=_point_data))
+        _point_base
         .mark_point(size=150, filled=True, color="#e45756")
         .encode(
             x=alt.X(
@@ -554,7 +620,7 @@ def spacematrix_plot(alt, fsi, gsi, mo):
     )
 
     _point_label = (
-        alt.Chart(alt.Data(values=_point_data))
+        _point_base
         .mark_text(align="left", dx=10, dy=-5, fontSize=12, fontWeight="bold", color="#e45756")
         .encode(
             x="GSI:Q",
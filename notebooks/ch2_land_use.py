@@ -14,6 +14,7 @@ def _():
     import polars as pl
     import altair as alt
     import math
+    import bisect
     import sys
     import os
 
@@ -31,11 +32,10 @@ def _():
         init_duckdb,
         bbox_from_center,
         bbox_predicate,
-        pedshed_filter,
+        local_projection,
         pedshed_area_m2,
-        pedshed_area_ha,
-        pedshed_area_km2,
         normalized_entropy,
+        persistent_table,
         DEFAULT_RADIUS_M,
     )
 
@@ -45,6 +45,7 @@ def _():
         pl,
         alt,
         math,
+        bisect,
         sys,
         os,
         CITIES,
@@ -55,11 +56,10 @@ def _():
         init_duckdb,
         bbox_from_center,
         bbox_predicate,
-        pedshed_filter,
+        local_projection,
         pedshed_area_m2,
-        pedshed_area_ha,
-        pedshed_area_km2,
         normalized_entropy,
+        persistent_table,
         DEFAULT_RADIUS_M,
     )
 
@@ -89,9 +89,11 @@ def city_selector_ui(mo, CITIES, DEFAULT_RADIUS_M):
         value=f"{_default.name} -- {_default.description}",
         label="City preset",
     )
+    # Overture layers are cached once per city at the largest radius
+    max_radius = 2000
     radius_m = mo.ui.slider(
         start=400,
-        stop=2000,
+        stop=max_radius,
         step=100,
         value=DEFAULT_RADIUS_M,
         label="Pedshed radius (m)",
@@ -106,7 +108,7 @@ metrics from Overture Maps base data.
 
 {radius_m}
 """)
-    return (city_dropdown, radius_m)
+    return (city_dropdown, max_radius, radius_m)
 
 
 # ---------------------------------------------------------------------------
@@ -119,8 +121,6 @@ def compute_bbox(
     CITIES,
     bbox_from_center,
     pedshed_area_m2,
-    pedshed_area_ha,
-    pedshed_area_km2,
     mo,
 ):
     _city_key = city_dropdown.value
@@ -130,10 +130,11 @@ def compute_bbox(
     study_lat = _city.lat
     study_lng = _city.lng
     study_radius = _radius
+    # These helpers, and the bbox_predicate strings built
+    # from the same (lat, lng, radius), are lru_cached in utils.overture:
+    # they must stay pure functions of their arguments.
     study_bbox = bbox_from_center(study_lat, study_lng, study_radius)
     study_area_m2 = pedshed_area_m2(study_radius)
-    study_area_ha = pedshed_area_ha(study_radius)
-    study_area_km2 = pedshed_area_km2(study_radius)
 
     mo.md(f"""
 **{_city.name}** -- {_city.description}
@@ -142,7 +143,7 @@ def compute_bbox(
 |-----------|-------|
 | Center | {study_lat:.4f}, {study_lng:.4f} |
 | Radius | {study_radius} m |
-| Study area | {study_area_ha:.1f} ha ({study_area_km2:.2f} km2) |
+| Study area | {study_area_m2 / 10_000:.1f} ha ({study_area_m2 / 1_000_000:.2f} km2) |
 | Bbox S/N | {study_bbox['south']:.4f} / {study_bbox['north']:.4f} |
 | Bbox W/E | {study_bbox['west']:.4f} / {study_bbox['east']:.4f} |
 """)
@@ -152,45 +153,137 @@ def compute_bbox(
         study_radius,
         study_bbox,
         study_area_m2,
-        study_area_ha,
-        study_area_km2,
     )
 
 
+# ---------------------------------------------------------------------------
+# Cell 4b — Per-city Overture cache
+# ---------------------------------------------------------------------------
+@app.cell
+def city_cache(
+    conn,
+    city_dropdown,
+    max_radius,
+    CITIES,
+    S3_LAND_USE,
+    S3_LAND_COVER,
+    S3_BUILDINGS,
+    S3_SEGMENTS,
+    bbox_from_center,
+    bbox_predicate,
+    local_projection,
+    persistent_table,
+    math,
+):
+    # Keyed on the city only: each layer is read from S3 once at the
+    # largest radius into an on-disk table, and radius slider moves become
+    # a local filter on edge_dist_m.  Geometries are projected once into a
+    # local equal-area CRS centred on the city, so areas and lengths are
+    # planar and edge_dist_m (distance from the centre to the nearest part
+    # of the feature) is distance to the origin.  The bbox predicate prunes
+    # the scan and each layer keeps features with edge_dist_m <= max_radius,
+    # a metric circle, so every slider radius sees the full pedshed.
+    _city = CITIES[city_dropdown.value]
+    _bbox_pred = bbox_predicate(bbox_from_center(_city.lat, _city.lng, max_radius))
+    _proj = local_projection(_city.lat, _city.lng)
+    _transform = f"ST_Transform(geometry, 'EPSG:4326', '{_proj}', always_xy := true)"
+    # Metres per degree at the city latitude (equirectangular)
+    _m_per_deg_lat = 111_320.0
+    _m_per_deg_lng = 111_320.0 * math.cos(math.radians(_city.lat))
+
+    def _scan(path, extra=""):
+        return f"""
+        FROM read_parquet('{path}', hive_partitioning=1)
+        WHERE {_bbox_pred}{extra}
+        """
+
+    # Park distance is taken from the centre of the Overture bbox struct,
+    # within metres of the centroid at pedshed scale and free to compute.
+    land_use_table = persistent_table(conn, f"ch2_land_use:{city_dropdown.value}:{max_radius}", f"""
+        WITH projected AS (
+            SELECT
+                class,
+                {_transform} AS geom,
+                sqrt(
+                    pow(((bbox.xmin + bbox.xmax) / 2 - {_city.lng:.6f}) * {_m_per_deg_lng:.3f}, 2)
+                    + pow(((bbox.ymin + bbox.ymax) / 2 - {_city.lat:.6f}) * {_m_per_deg_lat:.3f}, 2)
+                ) AS distance_m
+            {_scan(S3_LAND_USE)}
+        )
+        SELECT
+            class,
+            ST_Area(geom) AS area_m2,
+            distance_m,
+            ST_Distance(geom, ST_Point(0, 0)) AS edge_dist_m
+        FROM projected
+        WHERE ST_Distance(geom, ST_Point(0, 0)) <= {max_radius}
+    """)
+
+    land_cover_table = persistent_table(conn, f"ch2_land_cover:{city_dropdown.value}:{max_radius}", f"""
+        WITH projected AS (
+            SELECT class, {_transform} AS geom
+            {_scan(S3_LAND_COVER)}
+        )
+        SELECT
+            class,
+            ST_Area(geom) AS area_m2,
+            ST_Distance(geom, ST_Point(0, 0)) AS edge_dist_m
+        FROM projected
+        WHERE ST_Distance(geom, ST_Point(0, 0)) <= {max_radius}
+    """)
+
+    # Building footprints and road centrelines for imperviousness, read in
+    # one UNION ALL so both S3 scans run in a single plan
+    sealed_table = persistent_table(conn, f"ch2_sealed:{city_dropdown.value}:{max_radius}", f"""
+        WITH projected AS (
+            SELECT 'building' AS src, {_transform} AS geom
+            {_scan(S3_BUILDINGS)}
+            UNION ALL
+            SELECT 'road' AS src, {_transform} AS geom
+            {_scan(S3_SEGMENTS, " AND subtype = 'road'")}
+        )
+        SELECT
+            src,
+            CASE WHEN src = 'building' THEN ST_Area(geom) ELSE ST_Length(geom) END AS measure,
+            ST_Distance(geom, ST_Point(0, 0)) AS edge_dist_m
+        FROM projected
+        WHERE ST_Distance(geom, ST_Point(0, 0)) <= {max_radius}
+    """)
+    return (land_use_table, land_cover_table, sealed_table)
+
+
 # ---------------------------------------------------------------------------
 # Cell 5 — Land Use query (Overture base/land_use)
 # ---------------------------------------------------------------------------
 @app.cell
 def land_use_query(
     conn,
-    S3_LAND_USE,
-    study_lat,
-    study_lng,
+    land_use_table,
     study_radius,
-    study_bbox,
-    bbox_predicate,
-    pedshed_filter,
     pl,
     mo,
 ):
-    _bbox_pred = bbox_predicate(study_bbox)
-    _circle_pred = pedshed_filter(study_lat, study_lng, study_radius)
-
+    # One grouped query serves both M2.1 (area by class) and M2.3 (distance
+    # to the nearest park): each class row carries its own nearest polygon,
+    # so the park cell only has to pick the closest of a few park rows.
     _sql = f"""
     SELECT
         class,
-        ST_Area_Spheroid(geometry) AS area_m2
-    FROM read_parquet('{S3_LAND_USE}', hive_partitioning=1)
-    WHERE {_bbox_pred}
-        AND {_circle_pred}
+        COUNT(*) AS features,
+        SUM(area_m2) AS total_area_m2,
+        MIN(distance_m) AS nearest_distance_m,
+        ARG_MIN(area_m2, distance_m) AS nearest_area_m2
+    FROM {land_use_table}
+    WHERE edge_dist_m <= {study_radius}
+    GROUP BY class
     """
 
     mo.md(f"Querying land_use for **{study_radius}m** pedshed ...")
     land_use_df = conn.execute(_sql).pl()
 
-    _types_found = land_use_df["class"].unique().to_list() if land_use_df.height > 0 else []
+    _types_found = land_use_df["class"].drop_nulls().to_list()
     mo.md(f"""
-Fetched **{land_use_df.height:,}** land-use polygons.
+Fetched **{land_use_df["features"].sum():,}** land-use polygons.
 
 **Classes found:** {', '.join(str(t) for t in sorted(_types_found)) if _types_found else 'none'}
 """)
@@ -202,26 +295,27 @@ Fetched **{land_use_df.height:,}** land-use polygons.
 # ---------------------------------------------------------------------------
 @app.cell
 def land_use_mix_entropy(land_use_df, normalized_entropy, pl, mo):
-    # Group by class and compute total area per class
+    # Area per class is already summed in SQL (Cell 5); only the shares
+    # are left to compute.  An empty pedshed (e.g. open water) yields an
+    # empty frame, which the guards below handle.
     _lu_grouped = (
         land_use_df
         .filter(pl.col("class").is_not_null())
-        .group_by("class")
-        .agg(pl.col("area_m2").sum().alias("total_area_m2"))
+        .select(
+            "class",
+            "total_area_m2",
+            (pl.col("total_area_m2") / pl.col("total_area_m2").sum()).alias("share"),
+        )
         .sort("total_area_m2", descending=True)
     )
 
     _total_area = _lu_grouped["total_area_m2"].sum()
 
-    # Compute proportions for each land-use class
-    _proportions = []
-    if _total_area > 0:
-        _proportions = [a / _total_area for a in _lu_grouped["total_area_m2"].to_list()]
+    # M2.1 -- Land Use Mix Index (normalised Shannon entropy) over the
+    # per-class shares, computed column-wise above
+    land_use_mix = normalized_entropy(_lu_grouped["share"]) if _total_area > 0 else 0.0
 
-    # M2.1 -- Land Use Mix Index (normalised Shannon entropy)
-    land_use_mix = normalized_entropy(_proportions) if _proportions else 0.0
-
-    _n_classes = len([p for p in _proportions if p > 0])
+    _n_classes = int((_lu_grouped["share"] > 0).sum()) if _total_area > 0 else 0
 
     # Interpretation
     if land_use_mix > 0.7:
@@ -258,26 +352,15 @@ def land_use_mix_entropy(land_use_df, normalized_entropy, pl, mo):
 @app.cell
 def land_cover_query(
     conn,
-    S3_LAND_COVER,
-    study_lat,
-    study_lng,
+    land_cover_table,
     study_radius,
-    study_bbox,
-    bbox_predicate,
-    pedshed_filter,
     pl,
     mo,
 ):
-    _bbox_pred = bbox_predicate(study_bbox)
-    _circle_pred = pedshed_filter(study_lat, study_lng, study_radius)
-
     _sql = f"""
-    SELECT
-        class,
-        ST_Area_Spheroid(geometry) AS area_m2
-    FROM read_parquet('{S3_LAND_COVER}', hive_partitioning=1)
-    WHERE {_bbox_pred}
-        AND {_circle_pred}
+    SELECT class, area_m2
+    FROM {land_cover_table}
+    WHERE edge_dist_m <= {study_radius}
     """
 
     mo.md(f"Querying land_cover for **{study_radius}m** pedshed ...")
@@ -300,11 +383,20 @@ def canopy_cover_metric(land_cover_df, study_area_m2, pl, mo):
     # Canopy-related classes from Overture land cover
     CANOPY_CLASSES = ("forest", "shrub", "wood", "tree", "scrub")
 
-    _canopy_df = land_cover_df.filter(
-        pl.col("class").is_in(list(CANOPY_CLASSES))
-    )
+    # Per-class cover totals, shared with the green-vs-sealed donut (Cell 12)
+    if land_cover_df.height == 0:
+        cover_grouped = pl.DataFrame(schema={"class": pl.String, "total_area_m2": pl.Float64})
+    else:
+        cover_grouped = (
+            land_cover_df
+            .filter(pl.col("class").is_not_null())
+            .group_by("class")
+            .agg(pl.col("area_m2").sum().alias("total_area_m2"))
+        )
 
-    canopy_area_m2 = _canopy_df["area_m2"].sum() if _canopy_df.height > 0 else 0.0
+    canopy_area_m2 = cover_grouped.filter(
+        pl.col("class").is_in(list(CANOPY_CLASSES))
+    )["total_area_m2"].sum()
     canopy_ratio = canopy_area_m2 / study_area_m2 if study_area_m2 > 0 else 0.0
     canopy_pct = canopy_ratio * 100.0
 
@@ -340,82 +432,63 @@ def canopy_cover_metric(land_cover_df, study_area_m2, pl, mo):
 > Reference: Konijnendijk et al. -- 30% canopy cover target for urban resilience.
 > Canopy classes: {', '.join(CANOPY_CLASSES)}
 """)
-    return (canopy_area_m2, canopy_ratio, canopy_pct)
+    return (canopy_area_m2, canopy_ratio, canopy_pct, cover_grouped)
 
 
 # ---------------------------------------------------------------------------
 # Cell 9 — M2.3 Park Proximity (distance to nearest park)
 # ---------------------------------------------------------------------------
 @app.cell
-def park_proximity_metric(
-    conn,
-    S3_LAND_USE,
-    study_lat,
-    study_lng,
-    study_radius,
-    study_bbox,
-    bbox_predicate,
-    pedshed_filter,
-    mo,
-):
-    _bbox_pred = bbox_predicate(study_bbox)
-    _circle_pred = pedshed_filter(study_lat, study_lng, study_radius)
-
-    # Query for park features in land_use and compute distance from center
-    _sql = f"""
-    SELECT
-        class,
-        ST_Distance_Spheroid(
-            ST_Centroid(geometry),
-            ST_Point({study_lng:.6f}, {study_lat:.6f})
-        ) AS distance_m,
-        ST_Area_Spheroid(geometry) AS area_m2
-    FROM read_parquet('{S3_LAND_USE}', hive_partitioning=1)
-    WHERE {_bbox_pred}
-        AND {_circle_pred}
-        AND class IN ('park', 'recreation', 'cemetery', 'garden', 'playground')
-    ORDER BY distance_m ASC
-    LIMIT 20
-    """
-
-    _park_result = conn.execute(_sql).pl()
+def park_proximity_metric(land_use_df, interpret_park_distance, pl, mo):
+    # Park features come from the per-class land_use rows of Cell 5, each
+    # already reduced to its nearest polygon; take the closest park class.
+    _nearest_idx = pl.col("nearest_distance_m").arg_min()
+    _park_result = (
+        land_use_df
+        .filter(pl.col("class").is_in(["park", "recreation", "cemetery", "garden", "playground"]))
+        .select(
+            pl.col("features").sum().alias("park_count"),
+            pl.col("nearest_distance_m").min(),
+            pl.col("class").get(_nearest_idx),
+            pl.col("nearest_area_m2").get(_nearest_idx),
+        )
+        .row(0, named=True)
+    ) if land_use_df.height > 0 else {"park_count": 0}
 
-    if _park_result.height > 0:
-        park_nearest_distance_m = _park_result["distance_m"][0]
-        park_count = _park_result.height
-        _nearest_class = _park_result["class"][0]
-        _nearest_area = _park_result["area_m2"][0]
-    else:
-        park_nearest_distance_m = float("inf")
-        park_count = 0
-        _nearest_class = "N/A"
-        _nearest_area = 0.0
+    # With no parks in the pedshed the aggregates come back null, so the
+    # distance is None rather than an infinite sentinel.
+    park_count = _park_result["park_count"]
+    park_nearest_distance_m = _park_result.get("nearest_distance_m")
+    _nearest_class = _park_result.get("class") or "N/A"
+    _nearest_area = _park_result.get("nearest_area_m2") or 0.0
 
     # Interpretation: WHO recommends green space within 300m
-    if park_nearest_distance_m <= 300:
-        _park_interpretation = (
-            f"Excellent access -- nearest park/green space is {park_nearest_distance_m:.0f}m away "
-            f"(within WHO 300m recommendation)."
-        )
-    elif park_nearest_distance_m <= 500:
-        _park_interpretation = (
-            f"Adequate access -- nearest park is {park_nearest_distance_m:.0f}m away "
-            f"(within 5-min walk, but above WHO 300m ideal)."
-        )
-    elif park_nearest_distance_m < float("inf"):
-        _park_interpretation = (
-            f"Poor access -- nearest park is {park_nearest_distance_m:.0f}m away. "
-            f"Exceeds the WHO 300m and typical 500m walkable thresholds."
-        )
-    else:
+    if park_nearest_distance_m is None:
         _park_interpretation = "No park features found within the pedshed."
+    else:
+        _park_interpretation = {
+            "Excellent": (
+                f"Excellent access -- nearest park/green space is {park_nearest_distance_m:.0f}m away "
+                f"(within WHO 300m recommendation)."
+            ),
+            "Adequate": (
+                f"Adequate access -- nearest park is {park_nearest_distance_m:.0f}m away "
+                f"(within 5-min walk, but above WHO 300m ideal)."
+            ),
+            "Poor": (
+                f"Poor access -- nearest park is {park_nearest_distance_m:.0f}m away. "
+                f"Exceeds the WHO 300m and typical 500m walkable thresholds."
+            ),
+        }[interpret_park_distance(park_nearest_distance_m)]
+
+    _distance_label = "N/A" if park_nearest_distance_m is None else f"{park_nearest_distance_m:.0f} m"
 
     mo.md(f"""
 ### M2.3 Park Proximity
 
 | Metric | Value |
 |--------|-------|
-| **Nearest park distance** | `{park_nearest_distance_m:.0f} m` |
+| **Nearest park distance** | `{_distance_label}` |
 | Parks in pedshed | {park_count} |
 | Nearest type | {_nearest_class} |
 | Nearest area | {_nearest_area:,.0f} m2 |
@@ -433,46 +506,21 @@ def park_proximity_metric(
 @app.cell
 def imperviousness_metric(
     conn,
-    S3_BUILDINGS,
-    S3_SEGMENTS,
-    study_lat,
-    study_lng,
+    sealed_table,
     study_radius,
-    study_bbox,
     study_area_m2,
-    bbox_predicate,
-    pedshed_filter,
     mo,
 ):
-    _bbox_pred = bbox_predicate(study_bbox)
-    _circle_pred = pedshed_filter(study_lat, study_lng, study_radius)
-
-    # 1. Building footprint area
-    _bldg_sql = f"""
-    SELECT
-        COALESCE(SUM(ST_Area_Spheroid(geometry)), 0) AS total_footprint_m2
-    FROM read_parquet('{S3_BUILDINGS}', hive_partitioning=1)
-    WHERE {_bbox_pred}
-        AND {_circle_pred}
-    """
-    _bldg_result = conn.execute(_bldg_sql).pl()
-    _building_footprint_m2 = _bldg_result["total_footprint_m2"][0] if _bldg_result.height > 0 else 0.0
-
-    # 2. Estimated road area (segment length x estimated width)
-    # Use road segments, estimate average carriageway width as 7m
-    _road_sql = f"""
+    # Building footprint area and estimated road area (segment length x an
+    # average 7m carriageway width)
+    _sql = f"""
     SELECT
-        COALESCE(
-            SUM(ST_Length_Spheroid(geometry) * 7.0),
-            0
-        ) AS estimated_road_area_m2
-    FROM read_parquet('{S3_SEGMENTS}', hive_partitioning=1)
-    WHERE {_bbox_pred}
-        AND {_circle_pred}
-        AND subtype = 'road'
+        COALESCE(SUM(measure) FILTER (WHERE src = 'building'), 0) AS total_footprint_m2,
+        COALESCE(SUM(measure * 7.0) FILTER (WHERE src = 'road'), 0) AS estimated_road_area_m2
+    FROM {sealed_table}
+    WHERE edge_dist_m <= {study_radius}
     """
-    _road_result = conn.execute(_road_sql).pl()
-    _road_area_m2 = _road_result["estimated_road_area_m2"][0] if _road_result.height > 0 else 0.0
+    _building_footprint_m2, _road_area_m2 = conn.execute(_sql).fetchone()
 
     # Imperviousness = (building footprint + estimated road area) / pedshed area
     _sealed_area_m2 = _building_footprint_m2 + _road_area_m2
@@ -534,16 +582,17 @@ def summary_table(
     imperviousness_ratio,
     compute_green_access,
     interpret_green_access,
+    interpret_park_distance,
     city_dropdown,
     radius_m,
     CITIES,
-    pl,
     mo,
 ):
     _city = CITIES[city_dropdown.value]
     _radius = radius_m.value
+    _green_access = compute_green_access(canopy_ratio, park_nearest_distance_m, park_count)
 
-    # Build summary dataframe
+    # Five rows: rendered straight to a markdown table, no DataFrame needed
     _rows = [
         {
             "Metric": "M2.1 Land Use Mix",
@@ -561,12 +610,12 @@ def summary_table(
         },
         {
             "Metric": "M2.3 Park Proximity",
-            "Value": f"{park_nearest_distance_m:.0f}" if park_nearest_distance_m < float("inf") else "N/A",
+            "Value": "N/A" if park_nearest_distance_m is None else f"{park_nearest_distance_m:.0f}",
             "Unit": "metres",
             "Threshold": "<=300m (WHO)",
             "Interpretation": (
-                "Excellent" if park_nearest_distance_m <= 300
-                else ("Adequate" if park_nearest_distance_m <= 500 else "Poor")
+                "No parks" if park_nearest_distance_m is None
+                else interpret_park_distance(park_nearest_distance_m)
             ),
         },
         {
@@ -582,16 +631,17 @@ def summary_table(
         },
         {
             "Metric": "M2.5 Green Access Score",
-            "Value": f"{compute_green_access(canopy_ratio, park_nearest_distance_m, park_count):.2f}",
+            "Value": f"{_green_access:.2f}",
             "Unit": "composite (0-1)",
             "Threshold": ">0.6 good, <0.3 poor",
-            "Interpretation": interpret_green_access(
-                compute_green_access(canopy_ratio, park_nearest_distance_m, park_count)
-            ),
+            "Interpretation": interpret_green_access(_green_access),
         },
     ]
 
-    summary_df = pl.DataFrame(_rows)
+    _header = "| " + " | ".join(_rows[0]) + " |\n|" + "---|" * len(_rows[0])
+    summary_md = "\n".join(
+        [_header] + ["| " + " | ".join(str(v) for v in _row.values()) + " |" for _row in _rows]
+    )
 
     mo.md(f"""
 ---
@@ -600,18 +650,26 @@ def summary_table(
 
 **City:** {_city.name} | **Radius:** {_radius} m
 
-{mo.as_html(summary_df.to_pandas())}
+{summary_md}
 
 *5 metrics from Overture Maps base data (land_use, land, buildings, segments),
 computed via DuckDB + S3 predicate pushdown.*
 """)
-    return (summary_df,)
+    return (summary_md,)
 
 
 @app.cell
-def green_access_helpers():
+def green_access_helpers(bisect, math):
     """Helper functions for the composite Green Access Score (M2.5)."""
 
+    # Inclusive upper bound of each park-distance band, WHO 300m first
+    _park_bands = ((300, "Excellent"), (500, "Adequate"), (math.inf, "Poor"))
+    _park_limits = [limit for limit, _ in _park_bands]
+
+    def interpret_park_distance(distance_m):
+        """Band label for the distance to the nearest park, in metres."""
+        return _park_bands[bisect.bisect_left(_park_limits, distance_m)][1]
+
     def compute_green_access(canopy_ratio, park_distance_m, park_count):
         """Composite green access score combining canopy, proximity, and count.
 
@@ -624,7 +682,7 @@ def green_access_helpers():
         canopy_score = min(canopy_ratio / 0.30, 1.0)
 
         # Proximity component: inverse distance normalised to 500m threshold
-        if park_distance_m <= 0 or park_distance_m == float("inf"):
+        if park_distance_m is None or park_distance_m <= 0:
             proximity_score = 0.0
         else:
             proximity_score = max(0.0, min(1.0, 1.0 - (park_distance_m / 500.0)))
@@ -642,7 +700,7 @@ def green_access_helpers():
         else:
             return "Poor"
 
-    return (compute_green_access, interpret_green_access)
+    return (compute_green_access, interpret_green_access, interpret_park_distance)
 
 
 # ---------------------------------------------------------------------------
@@ -651,7 +709,7 @@ def green_access_helpers():
 @app.cell
 def visualisations(
     lu_grouped,
-    land_cover_df,
+    cover_grouped,
     canopy_area_m2,
     study_area_m2,
     land_use_mix,
@@ -663,10 +721,10 @@ def visualisations(
     # -----------------------------------------------------------------------
     # Chart 1: Land use composition (horizontal bar chart by class)
     # -----------------------------------------------------------------------
-    _lu_chart_data = lu_grouped.to_pandas()
-
+    # Altair 5 consumes Polars frames directly through the dataframe
+    # interchange protocol, so none of these tiny frames go through pandas.
     land_use_bar_chart = (
-        alt.Chart(_lu_chart_data)
+        alt.Chart(lu_grouped)
         .mark_bar()
         .encode(
             x=alt.X("total_area_m2:Q", title="Area (m\u00b2)"),
@@ -693,28 +751,19 @@ def visualisations(
     # -----------------------------------------------------------------------
     GREEN_CLASSES = ("forest", "shrub", "wood", "tree", "scrub", "grass", "wetland", "moss")
 
-    _cover_grouped = (
-        land_cover_df
-        .filter(pl.col("class").is_not_null())
-        .group_by("class")
-        .agg(pl.col("area_m2").sum().alias("total_area_m2"))
-    )
-
-    _cover_dict = dict(
-        zip(
-            _cover_grouped["class"].to_list(),
-            _cover_grouped["total_area_m2"].to_list(),
-        )
-    ) if _cover_grouped.height > 0 else {}
-
-    _green_total = sum(_cover_dict.get(c, 0.0) for c in GREEN_CLASSES)
-    _other_cover = sum(v for k, v in _cover_dict.items() if k not in GREEN_CLASSES)
+    # Green and non-green totals in one pass over the per-class cover
+    # (sums of an empty frame are 0, so no pedshed needs special-casing)
+    _is_green = pl.col("class").is_in(list(GREEN_CLASSES))
+    _green_total, _other_cover = cover_grouped.select(
+        pl.col("total_area_m2").filter(_is_green).sum(),
+        pl.col("total_area_m2").filter(~_is_green).sum().alias("other_m2"),
+    ).row(0)
     _unclassified = max(0.0, study_area_m2 - _green_total - _other_cover)
 
     _donut_data = pl.DataFrame({
         "category": ["Green / Canopy", "Built / Other Cover", "Unclassified"],
         "area_m2": [_green_total, _other_cover, _unclassified],
-    }).to_pandas()
+    })
 
     donut_chart = (
         alt.Chart(_donut_data)
@@ -745,21 +794,11 @@ def visualisations(
     # Chart 3: Land Use Diversity gauge (entropy value as arc)
     # -----------------------------------------------------------------------
     # Build a simple gauge-like arc chart showing the entropy value
-    _gauge_bg = pl.DataFrame({
-        "label": ["Remaining"],
-        "value": [1.0 - land_use_mix],
-    }).to_pandas()
-
-    _gauge_fg = pl.DataFrame({
-        "label": ["Land Use Mix"],
-        "value": [land_use_mix],
-    }).to_pandas()
-
     _gauge_all = pl.DataFrame({
         "label": ["Land Use Mix", "Remaining"],
         "value": [land_use_mix, 1.0 - land_use_mix],
         "color_key": ["mix", "bg"],
-    }).to_pandas()
+    })
 
     gauge_chart = (
         alt.Chart(_gauge_all)
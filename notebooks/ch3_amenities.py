@@ -11,7 +11,9 @@ app = marimo.App(width="medium")
 def _():
     import marimo as mo
     import sys, os, math
+    import numpy as np
     import polars as pl
+    from scipy.spatial import KDTree
     import altair as alt
 
     # Ensure the notebooks/ directory is on the path so we can import utils
@@ -25,9 +27,9 @@ def _():
         S3_PLACES,
         bbox_from_center,
         bbox_predicate,
-        pedshed_filter,
         pedshed_area_ha,
         normalized_entropy,
+        persistent_table,
         DEFAULT_RADIUS_M,
     )
 
@@ -36,16 +38,18 @@ def _():
         sys,
         os,
         math,
+        np,
         pl,
+        KDTree,
         alt,
         init_duckdb,
         CITIES,
         S3_PLACES,
         bbox_from_center,
         bbox_predicate,
-        pedshed_filter,
         pedshed_area_ha,
         normalized_entropy,
+        persistent_table,
         DEFAULT_RADIUS_M,
     )
 
@@ -64,7 +68,7 @@ def _(init_duckdb, mo):
 # Cell 3 — Essential categories mapping
 # ---------------------------------------------------------------------------
 @app.cell
-def _():
+def _(pl):
     ESSENTIAL_CATEGORIES = {
         "food": [
             "supermarket", "grocery", "market", "butcher", "bakery",
@@ -91,7 +95,14 @@ def _():
             "professional_services", "community_center",
         ],
     }
-    return (ESSENTIAL_CATEGORIES,)
+    # Keyword -> group lookup, built once here rather than on every
+    # re-run of the completeness cell
+    ESSENTIAL_REVERSE = pl.DataFrame(
+        [(kw, group) for group, keywords in ESSENTIAL_CATEGORIES.items() for kw in keywords],
+        schema={"kw": pl.String, "group": pl.String},
+        orient="row",
+    )
+    return (ESSENTIAL_CATEGORIES, ESSENTIAL_REVERSE)
 
 
 # ---------------------------------------------------------------------------
@@ -109,9 +120,11 @@ def _(mo, CITIES, DEFAULT_RADIUS_M):
         value=f"{_default.name} -- {_default.description}",
         label="City preset",
     )
+    # Places are cached once per city at the largest radius
+    max_radius = 2000
     radius_slider = mo.ui.slider(
         start=400,
-        stop=2000,
+        stop=max_radius,
         step=100,
         value=DEFAULT_RADIUS_M,
         label="Pedshed radius (m)",
@@ -126,7 +139,7 @@ from Overture Maps *places* data.
 
 {radius_slider}
 """)
-    return (city_dropdown, radius_slider)
+    return (city_dropdown, max_radius, radius_slider)
 
 
 # ---------------------------------------------------------------------------
@@ -172,67 +185,97 @@ def _(
 
 
 # ---------------------------------------------------------------------------
-# Cell 6 — Places query
+# Cell 5b — Per-city places cache
 # ---------------------------------------------------------------------------
 @app.cell
 def _(
     conn,
-    center_lat,
-    center_lng,
-    study_radius,
-    study_bbox,
+    city_dropdown,
+    max_radius,
+    CITIES,
     S3_PLACES,
+    bbox_from_center,
     bbox_predicate,
-    pedshed_filter,
-    pl,
-    mo,
+    persistent_table,
+    math,
 ):
-    _bbox_pred = bbox_predicate(study_bbox)
-    _ped_filter = pedshed_filter(center_lat, center_lng, study_radius)
+    # Keyed on the city only: places are read from S3 once at the largest
+    # radius into an on-disk table, so revisiting a city or moving the
+    # radius slider never goes back to S3.  The bbox predicate prunes the
+    # scan and the cache keeps places with distance_m <= max_radius, a
+    # metric circle, so every slider radius sees the full pedshed.
+    _city = CITIES[city_dropdown.value]
+    _bbox_pred = bbox_predicate(bbox_from_center(_city.lat, _city.lng, max_radius))
+    # Metres per degree at the city latitude (equirectangular): within 2 km
+    # of the centre this is well under a metre off the spheroid distance
+    _m_per_deg_lat = 111_320.0
+    _m_per_deg_lng = 111_320.0 * math.cos(math.radians(_city.lat))
+
+    places_cache = persistent_table(conn, f"ch3_places:{city_dropdown.value}:{max_radius}", f"""
+    SELECT * FROM (
+        SELECT
+            LOWER(categories.primary) AS primary_category,
+            ST_X(geometry) AS lng,
+            ST_Y(geometry) AS lat,
+            sqrt(
+                pow((ST_X(geometry) - {_city.lng:.6f}) * {_m_per_deg_lng:.3f}, 2)
+                + pow((ST_Y(geometry) - {_city.lat:.6f}) * {_m_per_deg_lat:.3f}, 2)
+            ) AS distance_m
+        FROM read_parquet('{S3_PLACES}', hive_partitioning=1)
+        WHERE {_bbox_pred}
+    )
+    WHERE distance_m <= {max_radius}
+    """)
+    return (places_cache,)
 
-    _sql = f"""
-    SELECT
-        id,
-        categories.primary AS primary_category,
-        ST_X(geometry) AS lng,
-        ST_Y(geometry) AS lat,
-        ST_Distance_Spheroid(
-            geometry,
-            ST_Point({center_lng:.6f}, {center_lat:.6f})
-        ) AS distance_m
-    FROM read_parquet('{S3_PLACES}', hive_partitioning=1)
-    WHERE {_bbox_pred}
-      AND {_ped_filter}
-    """
 
+# ---------------------------------------------------------------------------
+# Cell 6 — Places query
+# ---------------------------------------------------------------------------
+@app.cell
+def _(conn, places_cache, study_radius, mo):
+    # The current pedshed is a view over the city cache; the metric cells
+    # work from small aggregates of it instead of each re-filtering every
+    # POI in Python.
+    places_table = "pedshed_places"
     mo.md(f"Querying places for **{study_radius} m** pedshed ...")
-    places_df = conn.execute(_sql).pl()
-    place_count = len(places_df)
+    conn.execute(f"""
+    CREATE OR REPLACE TEMP VIEW {places_table} AS
+    SELECT * FROM {places_cache}
+    WHERE distance_m <= {study_radius}
+    """)
+
+    # One row per (lowercased) category: POI count and nearest distance.
+    # A few hundred rows at most, whatever the pedshed density.
+    category_df = conn.execute(f"""
+    SELECT primary_category, COUNT(*) AS n, MIN(distance_m) AS nearest_m
+    FROM {places_table}
+    GROUP BY primary_category
+    ORDER BY n DESC
+    """).pl()
+    place_count = int(category_df["n"].sum())
 
     mo.md(f"Fetched **{place_count:,}** places within the pedshed.")
-    return (places_df, place_count)
+    return (places_table, category_df, place_count)
 
 
 # ---------------------------------------------------------------------------
 # Cell 7 — Metric 1: 15-Minute Completeness
 # ---------------------------------------------------------------------------
 @app.cell
-def _(places_df, ESSENTIAL_CATEGORIES, pl, mo):
-    # Map each POI to an essential group
-    _cat_list = places_df["primary_category"].to_list()
-    _reverse_map = {}
-    for group, keywords in ESSENTIAL_CATEGORIES.items():
-        for kw in keywords:
-            _reverse_map[kw] = group
-
-    matched_groups = set()
+def _(category_df, ESSENTIAL_CATEGORIES, ESSENTIAL_REVERSE, pl, mo):
+    # Map each category's POI count to its essential group with a join
+    # (null categories never match), then sum per group
+    _group_counts = (
+        category_df
+        .join(ESSENTIAL_REVERSE, left_on="primary_category", right_on="kw", how="inner")
+        .group_by("group")
+        .agg(pl.col("n").sum())
+    )
+
     essential_group_counts = {g: 0 for g in ESSENTIAL_CATEGORIES}
-    for _cat in _cat_list:
-        if _cat is not None:
-            _g = _reverse_map.get(_cat.lower())
-            if _g is not None:
-                matched_groups.add(_g)
-                essential_group_counts[_g] += 1
+    essential_group_counts.update(zip(_group_counts["group"], _group_counts["n"]))
+    matched_groups = set(_group_counts["group"])
 
     groups_present = len(matched_groups)
     completeness_score = groups_present / 6.0
@@ -266,18 +309,15 @@ else f"Missing categories: **{', '.join(_missing_names)}**"}
 # Cell 8 — Metric 2: Social Density
 # ---------------------------------------------------------------------------
 @app.cell
-def _(places_df, study_area_ha, pl, mo):
+def _(category_df, study_area_ha, pl, mo):
     SOCIAL_CATEGORIES = [
         "cafe", "pub", "bar", "restaurant", "library",
         "community_center", "park",
     ]
 
-    social_places_df = places_df.filter(
-        pl.col("primary_category")
-        .str.to_lowercase()
-        .is_in(SOCIAL_CATEGORIES)
-    )
-    social_count = len(social_places_df)
+    social_count = category_df.filter(
+        pl.col("primary_category").is_in(SOCIAL_CATEGORIES)
+    )["n"].sum()
     social_density = social_count / study_area_ha if study_area_ha > 0 else 0.0
 
     if social_density > 2.0:
@@ -307,20 +347,16 @@ within the pedshed.
 # Cell 9 — Metric 3: Fresh Food Access
 # ---------------------------------------------------------------------------
 @app.cell
-def _(places_df, pl, mo):
+def _(category_df, pl, mo):
     FRESH_FOOD_CATEGORIES = ["supermarket", "grocery", "market"]
 
-    fresh_food_df = places_df.filter(
-        pl.col("primary_category")
-        .str.to_lowercase()
-        .is_in(FRESH_FOOD_CATEGORIES)
+    # Nearest is None when no fresh-food category is present
+    fresh_food_count, nearest_food_distance = (
+        category_df
+        .filter(pl.col("primary_category").is_in(FRESH_FOOD_CATEGORIES))
+        .select(pl.col("n").sum(), pl.col("nearest_m").min())
+        .row(0)
     )
-    fresh_food_count = len(fresh_food_df)
-
-    if fresh_food_count > 0:
-        nearest_food_distance = fresh_food_df["distance_m"].min()
-    else:
-        nearest_food_distance = None
 
     if nearest_food_distance is None:
         _food_flag = "**FOOD DESERT** -- no supermarket/grocery/market found in pedshed"
@@ -347,7 +383,7 @@ Nearest supermarket, grocery, or market within the pedshed.
 # Cell 10 — Metric 4: Daily Needs Index
 # ---------------------------------------------------------------------------
 @app.cell
-def _(places_df, pl, mo):
+def _(category_df, pl, mo):
     # Weighted count of daily-need POIs, normalised to 0-100
     DAILY_WEIGHTS = {
         "grocery": 2.0,
@@ -363,12 +399,16 @@ def _(places_df, pl, mo):
         "public_transportation": 1.0,
     }
 
-    _cats = places_df["primary_category"].to_list()
-    _raw_score = 0.0
-    for _cat in _cats:
-        if _cat is not None:
-            _w = DAILY_WEIGHTS.get(_cat.lower(), 0.0)
-            _raw_score += _w
+    # Each category's weight times its POI count, in one expression over
+    # the per-category summary (unweighted categories map to 0)
+    _raw_score = category_df.select(
+        (
+            pl.col("primary_category").replace_strict(
+                DAILY_WEIGHTS, default=0.0, return_dtype=pl.Float64
+            )
+            * pl.col("n")
+        ).sum()
+    ).item()
 
     # Normalise: assume 50 weighted points = score of 100 (saturation point)
     _saturation = 50.0
@@ -395,47 +435,41 @@ transit x1), normalised to 0-100.
 # Cell 11 — Metric 5: Retail Clustering (Average Nearest Neighbour)
 # ---------------------------------------------------------------------------
 @app.cell
-def _(places_df, study_area_ha, pl, math, mo):
+def _(conn, places_table, study_area_ha, KDTree, np, math, mo):
     RETAIL_CATEGORIES = [
         "shopping", "clothing_store", "department_store",
         "shopping_mall", "retail", "supermarket", "grocery",
         "convenience_store", "store",
     ]
 
-    retail_df = places_df.filter(
-        pl.col("primary_category")
-        .str.to_lowercase()
-        .is_in(RETAIL_CATEGORIES)
-    )
+    # Only the retail coordinates leave DuckDB
+    _retail_list = ", ".join(f"'{c}'" for c in RETAIL_CATEGORIES)
+    retail_df = conn.execute(f"""
+    SELECT lng, lat
+    FROM {places_table}
+    WHERE primary_category IN ({_retail_list})
+    """).pl()
     retail_count = len(retail_df)
 
     if retail_count >= 2:
         # Extract coordinates
-        _lngs = retail_df["lng"].to_list()
-        _lats = retail_df["lat"].to_list()
+        _lngs = retail_df["lng"].to_numpy()
+        _lats = retail_df["lat"].to_numpy()
         _n = len(_lngs)
 
         # Compute nearest neighbour distance for each point (in degrees, convert to approx metres)
         # Use mean latitude for degree-to-metre conversion
-        _mean_lat = sum(_lats) / _n
+        _mean_lat = float(_lats.mean())
         _lat_m = 111_320.0
         _lng_m = 111_320.0 * math.cos(math.radians(_mean_lat))
 
-        _nn_distances = []
-        for _i in range(_n):
-            _min_d = float("inf")
-            for _j in range(_n):
-                if _i == _j:
-                    continue
-                _dx = (_lngs[_j] - _lngs[_i]) * _lng_m
-                _dy = (_lats[_j] - _lats[_i]) * _lat_m
-                _d = math.sqrt(_dx * _dx + _dy * _dy)
-                if _d < _min_d:
-                    _min_d = _d
-            _nn_distances.append(_min_d)
+        # KD-tree over the projected points: k=2 because each point's
+        # nearest hit is itself, so column 1 is the nearest other point
+        _coords = np.column_stack([_lngs * _lng_m, _lats * _lat_m])
+        _nn_distances, _ = KDTree(_coords).query(_coords, k=2)
 
         # Observed mean nearest neighbour distance
-        observed_ann = sum(_nn_distances) / _n
+        observed_ann = float(_nn_distances[:, 1].mean())
 
         # Expected mean nearest neighbour distance for random distribution
         # E(d) = 0.5 * sqrt(A/n), where A is area in m^2
@@ -585,18 +619,16 @@ def _(
 # Cell 13 — Visualization: Category distribution bar chart (top 15)
 # ---------------------------------------------------------------------------
 @app.cell
-def _(places_df, pl, alt, mo):
+def _(category_df, pl, alt, mo):
     _cat_counts = (
-        places_df
+        category_df
         .filter(pl.col("primary_category").is_not_null())
-        .group_by("primary_category")
-        .len()
-        .sort("len", descending=True)
+        .select("primary_category", pl.col("n").alias("len"))
         .head(15)
     )
 
     category_bar_chart = (
-        alt.Chart(_cat_counts.to_pandas())
+        alt.Chart(_cat_counts)
         .mark_bar()
         .encode(
             x=alt.X("len:Q", title="Count"),
@@ -632,17 +664,22 @@ def _(essential_group_counts, matched_groups, ESSENTIAL_CATEGORIES, pl, alt, mat
     # Normalise to 0-1 for the radar
     _normed = [v / _max_val for v in _values]
 
+    # One frame serves every layer: a row per category (closing the
+    # polygon with a copy of the first) carrying both the point and its
+    # axis-label position; points and labels filter out the closing row.
     _n = len(_categories)
     _radar_rows = []
-    for _i, (_cat, norm_val) in enumerate(zip(_categories, _normed)):
+    for _i, (_cat, _norm_val) in enumerate(zip(_categories, _normed)):
         _angle = 2 * math.pi * _i / _n
         _radar_rows.append({
             "category": _cat.title(),
-            "value": norm_val,
+            "value": _norm_val,
             "raw_count": _values[_i],
             "angle": _angle,
-            "x": norm_val * math.cos(_angle),
-            "y": norm_val * math.sin(_angle),
+            "x": _norm_val * math.cos(_angle),
+            "y": _norm_val * math.sin(_angle),
+            "lx": 1.15 * math.cos(_angle),
+            "ly": 1.15 * math.sin(_angle),
             "order": _i,
         })
     # Close polygon
@@ -651,10 +688,11 @@ def _(essential_group_counts, matched_groups, ESSENTIAL_CATEGORIES, pl, alt, mat
         _close["order"] = _n
         _radar_rows.append(_close)
 
-    _radar_df = pl.DataFrame(_radar_rows).to_pandas()
+    _radar = alt.Chart(pl.DataFrame(_radar_rows))
+    _vertices = _radar.transform_filter(alt.datum.order < _n)
 
     _polygon = (
-        alt.Chart(_radar_df)
+        _radar
         .mark_area(opacity=0.3, color="#2ca02c")
         .encode(
             x=alt.X("x:Q", axis=None, scale=alt.Scale(domain=[-1.3, 1.3])),
@@ -664,14 +702,13 @@ def _(essential_group_counts, matched_groups, ESSENTIAL_CATEGORIES, pl, alt, mat
     )
 
     _line = (
-        alt.Chart(_radar_df)
+        _radar
         .mark_line(color="#2ca02c", strokeWidth=2)
         .encode(x="x:Q", y="y:Q", order="order:O")
     )
 
-    _points_df = pl.DataFrame(_radar_rows[:_n]).to_pandas()
     _points = (
-        alt.Chart(_points_df)
+        _vertices
         .mark_point(size=80, filled=True, color="#2ca02c")
         .encode(
             x="x:Q",
@@ -681,18 +718,8 @@ def _(essential_group_counts, matched_groups, ESSENTIAL_CATEGORIES, pl, alt, mat
     )
 
     # Axis labels
-    _labels_data = []
-    for _i, _cat in enumerate(_categories):
-        _a = 2 * math.pi * _i / _n
-        _labels_data.append({
-            "category": _cat.title(),
-            "lx": 1.15 * math.cos(_a),
-            "ly": 1.15 * math.sin(_a),
-        })
-    _labels_df = pl.DataFrame(_labels_data).to_pandas()
-
     _labels = (
-        alt.Chart(_labels_df)
+        _vertices
         .mark_text(fontSize=11, fontWeight="bold")
         .encode(x="lx:Q", y="ly:Q", text="category:N")
     )
@@ -715,24 +742,36 @@ def _(essential_group_counts, matched_groups, ESSENTIAL_CATEGORIES, pl, alt, mat
 # Cell 15 — Visualization: Distance histogram
 # ---------------------------------------------------------------------------
 @app.cell
-def _(places_df, pl, alt, mo):
-    _dist_data = places_df.select(
-        pl.col("distance_m").alias("distance")
-    ).filter(pl.col("distance").is_not_null())
+def _(conn, places_table, study_radius, alt, mo):
+    # Binned in DuckDB so the chart gets 30 rows, not one per POI.
+    # Distances lie in [0, study_radius], so the bins are fixed-width.
+    _bins = 30
+    _width = study_radius / _bins
+    _dist_data = conn.execute(f"""
+    SELECT
+        bin * {_width} AS bin_start,
+        (bin + 1) * {_width} AS bin_end,
+        COUNT(*) AS pois
+    FROM (
+        SELECT LEAST(FLOOR(distance_m / {_width}), {_bins - 1}) AS bin
+        FROM {places_table}
+        WHERE distance_m IS NOT NULL
+    )
+    GROUP BY bin
+    ORDER BY bin
+    """).pl()
 
     distance_histogram = (
-        alt.Chart(_dist_data.to_pandas())
+        alt.Chart(_dist_data)
         .mark_bar(opacity=0.7, cornerRadiusTopLeft=3, cornerRadiusTopRight=3)
         .encode(
-            x=alt.X(
-                "distance:Q",
-                bin=alt.Bin(maxbins=30),
-                title="Distance from center (m)",
-            ),
-            y=alt.Y("count()", title="Number of POIs"),
+            x=alt.X("bin_start:Q", title="Distance from center (m)"),
+            x2="bin_end:Q",
+            y=alt.Y("pois:Q", title="Number of POIs"),
             tooltip=[
-                alt.Tooltip("distance:Q", bin=alt.Bin(maxbins=30), title="Distance bin"),
-                alt.Tooltip("count()", title="Count"),
+                alt.Tooltip("bin_start:Q", title="From (m)", format=".0f"),
+                alt.Tooltip("bin_end:Q", title="To (m)", format=".0f"),
+                alt.Tooltip("pois:Q", title="Count"),
             ],
         )
         .properties(
@@ -13,7 +13,6 @@ def _():
     import sys
     import os
     import math
-    import json
     import numpy as np
     import polars as pl
     import altair as alt
@@ -30,9 +29,11 @@ def _():
         S3_CONNECTORS,
         bbox_from_center,
         bbox_predicate,
-        pedshed_filter,
+        local_projection,
+        persistent_table,
         pedshed_area_km2,
         pedshed_area_m2,
+        shannon_entropy,
         DEFAULT_RADIUS_M,
     )
 
@@ -41,7 +42,6 @@ def _():
         sys,
         os,
         math,
-        json,
         np,
         pl,
         alt,
@@ -51,9 +51,11 @@ def _():
         S3_CONNECTORS,
         bbox_from_center,
         bbox_predicate,
-        pedshed_filter,
+        local_projection,
+        persistent_table,
         pedshed_area_km2,
         pedshed_area_m2,
+        shannon_entropy,
         DEFAULT_RADIUS_M,
     )
 
@@ -82,9 +84,11 @@ def _(mo, CITIES, DEFAULT_RADIUS_M):
         value=f"{_default.name} — {_default.description}",
         label="City preset",
     )
+    # Segments and connectors are cached once per city at the largest radius
+    max_radius = 2000
     radius_slider = mo.ui.slider(
         start=400,
-        stop=2000,
+        stop=max_radius,
         step=100,
         value=DEFAULT_RADIUS_M,
         label="Pedshed radius (m)",
@@ -99,7 +103,7 @@ Compute street network connectivity metrics from Overture Maps transportation da
 
 {radius_slider}
 """)
-    return (city_dropdown, radius_slider)
+    return (city_dropdown, max_radius, radius_slider)
 
 
 # ---------------------------------------------------------------------------
@@ -148,121 +152,148 @@ def _(
 
 
 # ---------------------------------------------------------------------------
-# Cell 5 — Query segments from Overture transportation
+# Cell 4b — Per-city street network cache
 # ---------------------------------------------------------------------------
 @app.cell
 def _(
     conn,
+    city_dropdown,
+    max_radius,
+    CITIES,
     S3_SEGMENTS,
-    study_lat,
-    study_lng,
-    study_radius,
-    study_bbox,
+    S3_CONNECTORS,
+    bbox_from_center,
     bbox_predicate,
-    pedshed_filter,
-    mo,
-    pl,
+    local_projection,
+    persistent_table,
+    math,
 ):
-    _bbox_pred = bbox_predicate(study_bbox)
-    _circle_pred = pedshed_filter(study_lat, study_lng, study_radius)
-
-    _sql = f"""
-    SELECT
-        id,
-        class,
-        subtype,
-        connectors,
-        ST_Length_Spheroid(geometry) AS length_m,
-        ST_AsGeoJSON(geometry) AS geom_json
-    FROM read_parquet('{S3_SEGMENTS}', hive_partitioning=1)
-    WHERE {_bbox_pred}
-        AND {_circle_pred}
-        AND subtype = 'road'
-    """
-
-    mo.md(f"Querying road segments for **{study_radius}m** pedshed ...")
-    segments_df = conn.execute(_sql).pl()
-    segment_count = len(segments_df)
-    mo.md(f"Fetched **{segment_count:,}** road segments.")
-    return (segments_df, segment_count)
+    # Keyed on the city only: both layers are read from S3 once at the
+    # largest radius into an on-disk table, so revisiting a city or moving
+    # the radius slider never goes back to S3.  edge_dist_m is the distance
+    # in metres from the centre to the nearest point of a segment, measured
+    # in a local equal-area CRS.  The bbox predicate prunes the scan and
+    # both caches keep rows within max_radius metres, a metric circle, so
+    # every slider radius sees the full pedshed.
+    _city = CITIES[city_dropdown.value]
+    _bbox_pred = bbox_predicate(bbox_from_center(_city.lat, _city.lng, max_radius))
+    _proj = local_projection(_city.lat, _city.lng)
+    # Metres per degree at the city latitude (equirectangular)
+    _m_per_deg_lat = 111_320.0
+    _m_per_deg_lng = 111_320.0 * math.cos(math.radians(_city.lat))
+
+    segments_cache = persistent_table(conn, f"ch4_segments:{city_dropdown.value}:{max_radius}", f"""
+    SELECT * FROM (
+        SELECT
+            id,
+            class,
+            subtype,
+            connectors,
+            ST_Length_Spheroid(geometry) AS length_m,
+            ST_X(ST_EndPoint(geometry)) - ST_X(ST_StartPoint(geometry)) AS dx,
+            ST_Y(ST_EndPoint(geometry)) - ST_Y(ST_StartPoint(geometry)) AS dy,
+            ST_Distance(
+                ST_Transform(geometry, 'EPSG:4326', '{_proj}', always_xy := true),
+                ST_Point(0, 0)
+            ) AS edge_dist_m
+        FROM read_parquet('{S3_SEGMENTS}', hive_partitioning=1)
+        WHERE {_bbox_pred}
+            AND subtype = 'road'
+    )
+    WHERE edge_dist_m <= {max_radius}
+    """)
+
+    connectors_cache = persistent_table(conn, f"ch4_connectors:{city_dropdown.value}:{max_radius}", f"""
+    SELECT * FROM (
+        SELECT
+            id,
+            ST_X(geometry) AS lng,
+            ST_Y(geometry) AS lat,
+            sqrt(
+                pow((ST_X(geometry) - {_city.lng:.6f}) * {_m_per_deg_lng:.3f}, 2)
+                + pow((ST_Y(geometry) - {_city.lat:.6f}) * {_m_per_deg_lat:.3f}, 2)
+            ) AS distance_m
+        FROM read_parquet('{S3_CONNECTORS}', hive_partitioning=1)
+        WHERE {_bbox_pred}
+    )
+    WHERE distance_m <= {max_radius}
+    """)
+    return (segments_cache, connectors_cache)
 
 
 # ---------------------------------------------------------------------------
-# Cell 6 — Query connectors from Overture transportation
+# Cell 5 — Pedshed segments & connectors
 # ---------------------------------------------------------------------------
 @app.cell
-def _(
-    conn,
-    S3_CONNECTORS,
-    study_lat,
-    study_lng,
-    study_radius,
-    study_bbox,
-    bbox_predicate,
-    pedshed_filter,
-    mo,
-    pl,
-):
-    _bbox_pred_c = bbox_predicate(study_bbox)
-    _circle_pred_c = pedshed_filter(study_lat, study_lng, study_radius)
-
-    _sql_c = f"""
-    SELECT
-        id,
-        ST_X(geometry) AS lng,
-        ST_Y(geometry) AS lat
-    FROM read_parquet('{S3_CONNECTORS}', hive_partitioning=1)
-    WHERE {_bbox_pred_c}
-        AND {_circle_pred_c}
+def _(conn, segments_cache, connectors_cache, study_radius, mo):
+    # The current pedshed is a pair of views over the city cache: the
+    # degree count (Cell 7) unnests the connector lists and the orientation
+    # cell (Cell 10) bins the endpoint offsets, all locally, so only class
+    # and length come back to Polars.
+    segments_table = "pedshed_segments"
+    connectors_table = "pedshed_connectors"
+    _sql = f"""
+    CREATE OR REPLACE TEMP VIEW {segments_table} AS
+    SELECT id, class, subtype, connectors, length_m, dx, dy
+    FROM {segments_cache}
+    WHERE edge_dist_m <= {study_radius};
+
+    CREATE OR REPLACE TEMP VIEW {connectors_table} AS
+    SELECT id, lng, lat
+    FROM {connectors_cache}
+    WHERE distance_m <= {study_radius};
     """
 
-    mo.md(f"Querying connectors for **{study_radius}m** pedshed ...")
-    connectors_df = conn.execute(_sql_c).pl()
-    connector_count = len(connectors_df)
-    mo.md(f"Fetched **{connector_count:,}** connectors (network nodes).")
-    return (connectors_df, connector_count)
+    mo.md(f"Querying road segments and connectors for **{study_radius}m** pedshed ...")
+    conn.execute(_sql)
+    segments_df = conn.execute(f"SELECT class, length_m FROM {segments_table}").pl()
+    segment_count = len(segments_df)
+    connector_count = conn.execute(f"SELECT COUNT(*) FROM {connectors_table}").fetchone()[0]
+    mo.md(
+        f"Fetched **{segment_count:,}** road segments and "
+        f"**{connector_count:,}** connectors (network nodes)."
+    )
+    return (segments_table, connectors_table, segments_df, segment_count, connector_count)
 
 
 # ---------------------------------------------------------------------------
 # Cell 7 — Build graph: node degree map from segments & connectors
 # ---------------------------------------------------------------------------
 @app.cell
-def _(segments_df, connectors_df, connector_count, mo):
-    # Build a set of valid connector IDs within the pedshed
-    _valid_ids = set(connectors_df["id"].to_list())
-
-    # Count how many segments reference each connector (node degree)
-    _degree_map: dict[str, int] = {}
-    _connectors_col = segments_df["connectors"].to_list()
-
-    for _seg_connectors in _connectors_col:
-        if _seg_connectors is None:
-            continue
-        # Each segment's connectors is a list of dicts with 'connector_id' key,
-        # or a list of strings — handle both formats
-        for _item in _seg_connectors:
-            if isinstance(_item, dict):
-                _cid = _item.get("connector_id", _item.get("id", ""))
-            elif isinstance(_item, str):
-                _cid = _item
-            else:
-                continue
-            if _cid in _valid_ids:
-                _degree_map[_cid] = _degree_map.get(_cid, 0) + 1
+def _(conn, segments_table, connectors_table, segment_count, connector_count, pl, mo):
+    # Node degree = number of segment references to a connector inside the
+    # pedshed.  The connector lists are unnested and counted in DuckDB, so
+    # only the (degree, count) distribution comes back: a handful of rows.
+    degree_distribution = conn.execute(f"""
+    WITH refs AS (
+        SELECT unnest(connectors).connector_id AS cid
+        FROM {segments_table}
+    ),
+    degrees AS (
+        SELECT cid, COUNT(*) AS degree
+        FROM refs
+        SEMI JOIN {connectors_table} ON refs.cid = {connectors_table}.id
+        GROUP BY cid
+    )
+    SELECT degree, COUNT(*) AS count
+    FROM degrees
+    GROUP BY degree
+    ORDER BY degree
+    """).pl()
 
     # Classify nodes by degree
-    dead_ends = sum(1 for d in _degree_map.values() if d == 1)
-    pass_through = sum(1 for d in _degree_map.values() if d == 2)
-    intersections_3way = sum(1 for d in _degree_map.values() if d >= 3)
-    intersections_4way = sum(1 for d in _degree_map.values() if d >= 4)
-    total_graph_nodes = len(_degree_map)
-    total_graph_edges = len(_connectors_col)
-
-    # Build a list of (degree, count) for distribution chart
-    _degree_counts: dict[int, int] = {}
-    for _d in _degree_map.values():
-        _degree_counts[_d] = _degree_counts.get(_d, 0) + 1
-    degree_distribution = sorted(_degree_counts.items())
+    _count = pl.col("count")
+    _degree = pl.col("degree")
+    dead_ends, pass_through, intersections_3way, intersections_4way, total_graph_nodes = (
+        degree_distribution.select(
+            _count.filter(_degree == 1).sum(),
+            _count.filter(_degree == 2).sum().alias("pass_through"),
+            _count.filter(_degree >= 3).sum().alias("three_way"),
+            _count.filter(_degree >= 4).sum().alias("four_way"),
+            _count.sum().alias("nodes"),
+        ).row(0)
+    )
+    total_graph_edges = segment_count
 
     mo.md(f"""
 ### Network Graph Summary
@@ -371,42 +402,28 @@ independent circuits for a planar graph.
 # Cell 10 — Metric 3: Orientation Entropy
 # ---------------------------------------------------------------------------
 @app.cell
-def _(segments_df, np, json, math, mo, pl):
-    # Parse geom_json to extract start/end coordinates and compute bearings
-    _geom_jsons = segments_df["geom_json"].to_list()
-
-    _bearings = []
-    for _gj in _geom_jsons:
-        if _gj is None:
-            continue
-        _parsed = json.loads(_gj)
-        _coords = _parsed.get("coordinates", [])
-        if len(_coords) < 2:
-            continue
-        # Use start and end points of the segment
-        _x0, _y0 = _coords[0][0], _coords[0][1]
-        _x1, _y1 = _coords[-1][0], _coords[-1][1]
-
-        _dx = _x1 - _x0
-        _dy = _y1 - _y0
-        if _dx == 0 and _dy == 0:
-            continue
-
-        # Compute bearing in degrees (0 = East, counter-clockwise)
-        _bearing = np.degrees(np.arctan2(_dy, _dx))
-        # Convert to compass bearing (0 = North, clockwise)
-        _compass = (90 - _bearing) % 360
-        # Fold to 0-180 range (undirected: north = south)
-        _folded = _compass % 180
-        _bearings.append(_folded)
-
-    _bearings_arr = np.array(_bearings)
-
-    # Bin into 36 bins of 5 degrees each (0-180)
+def _(conn, segments_table, shannon_entropy, np, math, mo):
+    # Bearings are binned in DuckDB from each segment's start-to-end offset
+    # (stored in Cell 5), so only 36 counts come back instead of every
+    # geometry.  Compass bearing (0 = North, clockwise) folded to 0-180
+    # (undirected: north = south); zero-length segments have no bearing
+    # and are skipped.
     _n_bins = 36
     _bin_width = 180.0 / _n_bins
+
+    _sql = f"""
+    SELECT
+        CAST(LEAST(FLOOR(((90 - degrees(atan2(dy, dx))) % 180 + 180) % 180 / {_bin_width}), {_n_bins - 1}) AS INTEGER) AS bin,
+        COUNT(*) AS n
+    FROM {segments_table}
+    WHERE dx <> 0 OR dy <> 0
+    GROUP BY bin
+    """
+    _bins = conn.execute(_sql).fetchnumpy()
+
+    _bin_counts_arr = np.zeros(_n_bins, dtype=np.int64)
+    _bin_counts_arr[_bins["bin"]] = _bins["n"]
     _bin_edges_arr = np.linspace(0, 180, _n_bins + 1)
-    _bin_counts_arr, _ = np.histogram(_bearings_arr, bins=_bin_edges_arr)
     _bin_centers = (_bin_edges_arr[:-1] + _bin_edges_arr[1:]) / 2.0
 
     # Compute Shannon entropy
@@ -417,14 +434,10 @@ def _(segments_df, np, json, math, mo, pl):
         _proportions = np.zeros(_n_bins)
 
     _h_max = math.log2(_n_bins)
-    _h_raw = -sum(
-        float(p) * math.log2(float(p)) for p in _proportions if p > 0
-    )
-    orientation_entropy = _h_raw / _h_max if _h_max > 0 else 0.0
+    orientation_entropy = shannon_entropy(_proportions) / _h_max if _h_max > 0 else 0.0
 
     # Grid order: sum of top 4 bin weights
-    _sorted_props = sorted(_proportions, reverse=True)
-    grid_order = sum(_sorted_props[:4])
+    grid_order = float(np.sort(_proportions)[-4:].sum())
 
     # Prepare data for rose / bar chart
     bearing_bin_centers = _bin_centers.tolist()
@@ -462,7 +475,7 @@ A perfect grid (all segments aligned to one axis) yields entropy near 0.
 |--------|-------|---------------|
 | Orientation entropy | {orientation_entropy:.3f} | 0 = perfect grid, 1 = uniform |
 | Grid order | {grid_order:.3f} | Sum of top-4 bin weights |
-| Total bearings | {len(_bearings):,} | Segments with valid geometry |
+| Total bearings | {_total_segments_bearing:,} | Segments with valid geometry |
 """)
     return (
         orientation_entropy,
@@ -619,7 +632,7 @@ def _(bearing_bin_centers, bearing_bin_counts, bearing_proportions, pl, alt, mo)
     })
 
     orientation_chart = (
-        alt.Chart(_bearing_df.to_pandas())
+        alt.Chart(_bearing_df)
         .mark_bar(opacity=0.8, color="#4ecdc4")
         .encode(
             x=alt.X(
@@ -653,7 +666,7 @@ def _(bearing_bin_centers, bearing_bin_counts, bearing_proportions, pl, alt, mo)
 @app.cell
 def _(class_breakdown_df, alt, mo):
     road_class_chart = (
-        alt.Chart(class_breakdown_df.to_pandas())
+        alt.Chart(class_breakdown_df)
         .mark_bar(opacity=0.8)
         .encode(
             y=alt.Y("class:N", sort="-x", title="Road class"),
@@ -686,14 +699,9 @@ def _(class_breakdown_df, alt, mo):
 # Cell 16 — Visualization: Node degree distribution (bar chart)
 # ---------------------------------------------------------------------------
 @app.cell
-def _(degree_distribution, pl, alt, mo):
-    _deg_df = pl.DataFrame({
-        "degree": [d for d, _ in degree_distribution],
-        "count": [c for _, c in degree_distribution],
-    })
-
+def _(degree_distribution, alt, mo):
     degree_chart = (
-        alt.Chart(_deg_df.to_pandas())
+        alt.Chart(degree_distribution)
         .mark_bar(opacity=0.8, color="#e45756")
         .encode(
             x=alt.X("degree:O", title="Node Degree"),
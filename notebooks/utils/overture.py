@@ -2,10 +2,17 @@
 
 from __future__ import annotations
 
+import functools
+import hashlib
 import math
+import os
+import weakref
 from dataclasses import dataclass
 
 import duckdb
+import numpy as np
+from numpy.typing import ArrayLike
+from scipy.special import xlogy
 
 
 # ---------------------------------------------------------------------------
@@ -14,6 +21,13 @@ import duckdb
 OVERTURE_RELEASE = "2026-01-21.0"
 OVERTURE_S3_BASE = f"s3://overturemaps-us-west-2/release/{OVERTURE_RELEASE}/theme"
 
+# Release files are written spatially clustered, so each row group's bbox
+# statistics are already tight and a pedshed-sized bbox predicate touches
+# a handful of contiguous row groups.  We read these paths directly rather
+# than keeping a re-sorted (e.g. Hilbert-ordered) copy: a local copy of a
+# whole theme is far larger than any query, and per-city slices are cached
+# by persistent_table() instead.
+
 S3_BUILDINGS = f"{OVERTURE_S3_BASE}=buildings/type=building/*"
 S3_SEGMENTS = f"{OVERTURE_S3_BASE}=transportation/type=segment/*"
 S3_CONNECTORS = f"{OVERTURE_S3_BASE}=transportation/type=connector/*"
@@ -59,11 +73,13 @@ OVERTURE_THEMES: dict[str, list[str]] = {
 }
 
 
+@functools.lru_cache(maxsize=64)
 def s3_path(theme: str, type_name: str) -> str:
     """Return full S3 glob path for an Overture theme/type."""
     return f"{OVERTURE_S3_BASE}={theme}/type={type_name}/*"
 
 
+@functools.lru_cache(maxsize=64)
 def latlng_to_tile(lat: float, lng: float, zoom: int) -> tuple[int, int, int]:
     """Convert lat/lng to tile coordinates (x, y, z) for slippy map tiles."""
     n = 2 ** zoom
@@ -164,16 +180,19 @@ REFERENCE_LNG = REFERENCE_CITY.lng
 DEFAULT_RADIUS_M = 1200  # 15-minute walk at 80m/min
 
 
+@functools.lru_cache(maxsize=256)
 def pedshed_area_m2(radius_m: float = DEFAULT_RADIUS_M) -> float:
     """Area of a circular pedshed in square metres."""
     return math.pi * radius_m ** 2
 
 
+@functools.lru_cache(maxsize=256)
 def pedshed_area_ha(radius_m: float = DEFAULT_RADIUS_M) -> float:
     """Area of a circular pedshed in hectares."""
     return pedshed_area_m2(radius_m) / 10_000
 
 
+@functools.lru_cache(maxsize=256)
 def pedshed_area_km2(radius_m: float = DEFAULT_RADIUS_M) -> float:
     """Area of a circular pedshed in square kilometres."""
     return pedshed_area_m2(radius_m) / 1_000_000
@@ -183,37 +202,62 @@ def bbox_from_center(lat: float, lng: float, radius_m: float = DEFAULT_RADIUS_M)
     """Generate a bounding box around a center point for predicate pushdown.
 
     Uses a generous buffer (1.5x radius) to ensure the bbox captures
-    all features that might fall within the circular pedshed.
+    all features that might fall within the circular pedshed.  A fresh
+    dict is returned each call; the bounds themselves are memoised.
     """
+    south, north, west, east = _bbox_from_center(lat, lng, radius_m)
+    return {"south": south, "north": north, "west": west, "east": east}
+
+
+@functools.lru_cache(maxsize=256)
+def _bbox_from_center(lat: float, lng: float, radius_m: float) -> tuple[float, float, float, float]:
     buffer = radius_m * 1.5
     # Approximate degrees per metre at given latitude
     lat_deg_per_m = 1 / 111_320
     lng_deg_per_m = 1 / (111_320 * math.cos(math.radians(lat)))
 
-    return {
-        "south": lat - buffer * lat_deg_per_m,
-        "north": lat + buffer * lat_deg_per_m,
-        "west": lng - buffer * lng_deg_per_m,
-        "east": lng + buffer * lng_deg_per_m,
-    }
+    return (
+        lat - buffer * lat_deg_per_m,
+        lat + buffer * lat_deg_per_m,
+        lng - buffer * lng_deg_per_m,
+        lng + buffer * lng_deg_per_m,
+    )
 
 
 def bbox_predicate(bbox: dict) -> str:
-    """Return SQL WHERE clause for Overture bbox predicate pushdown."""
+    """Return SQL WHERE clause for Overture bbox predicate pushdown.
+
+    Compares the GeoParquet 1.1 ``bbox`` covering struct against bare
+    decimal literals as an interval-overlap test, so features straddling
+    the bbox edge are kept and row groups whose footer min/max fall
+    outside it are skipped before any byte of them is fetched.  Keep it
+    that way: wrapping either side in a CAST (including ``::DOUBLE`` on
+    the literals) or binding the bounds as parameters stops DuckDB from
+    pushing the filter into the Parquet scan, and row groups can no longer
+    be skipped from their min/max statistics.
+    Parenthesised so it can be ANDed with later filters; put it first.
+    """
+    return _bbox_predicate(bbox["south"], bbox["north"], bbox["west"], bbox["east"])
+
+
+@functools.lru_cache(maxsize=64)
+def _bbox_predicate(south: float, north: float, west: float, east: float) -> str:
     return (
-        f"bbox.xmin <= {bbox['east']:.6f} "
-        f"AND bbox.xmax >= {bbox['west']:.6f} "
-        f"AND bbox.ymin <= {bbox['north']:.6f} "
-        f"AND bbox.ymax >= {bbox['south']:.6f}"
+        f"(bbox.xmin <= {east:.6f} "
+        f"AND bbox.xmax >= {west:.6f} "
+        f"AND bbox.ymin <= {north:.6f} "
+        f"AND bbox.ymax >= {south:.6f})"
     )
 
 
+@functools.lru_cache(maxsize=256)
 def pedshed_filter(lat: float, lng: float, radius_m: float = DEFAULT_RADIUS_M) -> str:
     """Return SQL WHERE clause for circular pedshed filter (post-predicate-pushdown).
 
     Uses ST_DWithin on the Overture geometry column. The bbox predicate
     should be applied FIRST for predicate pushdown, then this filter
-    narrows to the actual circle.
+    narrows to the actual circle; only geometries in row groups that
+    survive the bbox statistics are ever decoded.
     """
     return (
         f"ST_DWithin("
@@ -224,18 +268,170 @@ def pedshed_filter(lat: float, lng: float, radius_m: float = DEFAULT_RADIUS_M) -
     )
 
 
+@functools.lru_cache(maxsize=64)
+def local_projection(lat: float, lng: float) -> str:
+    """PROJ string for a Lambert azimuthal equal-area CRS centred on a point.
+
+    Within a pedshed (< 2 km from the centre) planar ``ST_Area`` /
+    ``ST_Perimeter`` on geometries transformed to this CRS are within 0.1%
+    of the spheroid functions, at a fraction of the cost.  Use with
+    ``ST_Transform(geometry, 'EPSG:4326', <proj>, always_xy := true)``.
+    """
+    return (
+        f"+proj=laea +lat_0={lat:.6f} +lon_0={lng:.6f} "
+        f"+datum=WGS84 +units=m +no_defs"
+    )
+
+
 # ---------------------------------------------------------------------------
 # DuckDB connection
 # ---------------------------------------------------------------------------
 def init_duckdb() -> duckdb.DuckDBPyConnection:
-    """Create a DuckDB connection with httpfs and spatial extensions loaded."""
+    """Create a DuckDB connection with httpfs and spatial extensions loaded.
+
+    Session settings are tuned for bbox-filtered scans of the public
+    Overture bucket: Parquet footers, S3 object metadata (sizes, ETags)
+    and fetched byte ranges are cached across queries, HTTP connections
+    are kept alive and transient S3 errors are retried, and scans may
+    return rows out of order so row groups are read in parallel (every
+    notebook query that needs an order says ORDER BY).  The terminal
+    progress bar is off; it only adds noise to notebook output.
+    """
     conn = duckdb.connect()
-    conn.execute("INSTALL httpfs; LOAD httpfs;")
-    conn.execute("INSTALL spatial; LOAD spatial;")
+    for ext in ("httpfs", "spatial"):
+        # LOAD alone is enough once installed; INSTALL only on first run
+        try:
+            conn.execute(f"LOAD {ext};")
+        except duckdb.Error:
+            conn.execute(f"INSTALL {ext}; LOAD {ext};")
     conn.execute("SET s3_region='us-west-2';")
+    conn.execute("SET enable_object_cache=true;")
+    conn.execute("SET enable_http_metadata_cache=true;")
+    conn.execute("SET enable_external_file_cache=true;")
+    conn.execute("SET preserve_insertion_order=false;")
+    conn.execute("SET http_keep_alive=true;")
+    conn.execute("SET http_retries=3;")
+    conn.execute("SET http_retry_backoff=2;")
+    conn.execute("SET enable_progress_bar=false;")
     return conn
 
 
+# Bbox slice of one Overture path.  The path is bound as $path; the bbox
+# predicate stays inlined as literals so it is pushed into the Parquet scan.
+SLICE_SQL = """
+    SELECT * FROM read_parquet($path, hive_partitioning=1)
+    WHERE {predicate}
+"""
+
+
+# connection → {table name → (S3 path, bbox predicate) currently materialised}.
+# Weakly keyed so a closed connection's entries go with it and can never be
+# mistaken for those of a new connection.
+_SLICE_KEYS: weakref.WeakKeyDictionary[
+    duckdb.DuckDBPyConnection, dict[str, tuple[str, str]]
+] = weakref.WeakKeyDictionary()
+
+
+def materialize_slice(
+    conn: duckdb.DuckDBPyConnection,
+    s3: str,
+    bbox: dict,
+    name: str = "current_slice",
+) -> str:
+    """Materialise the bbox slice of an Overture path as a temp table.
+
+    Downstream queries read from the returned table name instead of each
+    re-scanning S3.  Calling again with the same path and bbox is a no-op;
+    a different path or bbox drops and recreates the table.
+    """
+    key = (s3, bbox_predicate(bbox))
+    slices = _SLICE_KEYS.setdefault(conn, {})
+    if slices.get(name) != key:
+        conn.execute(
+            f"CREATE OR REPLACE TEMP TABLE {name} AS "
+            + SLICE_SQL.format(predicate=key[1]),
+            {"path": s3},
+        )
+        slices[name] = key
+    return name
+
+
+# On-disk cache of materialised Overture slices, shared across sessions
+CACHE_DB_PATH = os.path.join(os.path.dirname(__file__), "..", ".cache", "overture.duckdb")
+CACHE_ALIAS = "overture_cache"
+# key → (release, table name) of the live table for each cache key
+CACHE_INDEX = f"{CACHE_ALIAS}.cache_index"
+
+
+def persistent_table(conn: duckdb.DuckDBPyConnection, key: str, sql: str) -> str:
+    """Return a table holding the result of ``sql``, cached on local disk.
+
+    The table lives in ``CACHE_DB_PATH`` under a name derived from
+    ``OVERTURE_RELEASE``, ``key`` and the text of ``sql``, so a notebook
+    restart reuses it without a single S3 request, while a new release or
+    any edit to the query builds a fresh table instead of a stale entry.
+    The table a key replaces, and every table from an older release, is
+    dropped, so the cache file holds one table per key.  If the cache file
+    cannot be attached (e.g. another notebook process holds its lock) the
+    result is built as a temp table instead.
+    """
+    digest = hashlib.sha1(f"{OVERTURE_RELEASE}:{key}:{sql}".encode()).hexdigest()[:16]
+    name = f"t_{digest}"
+    try:
+        os.makedirs(os.path.dirname(CACHE_DB_PATH), exist_ok=True)
+        conn.execute(f"ATTACH IF NOT EXISTS '{CACHE_DB_PATH}' AS {CACHE_ALIAS};")
+    except duckdb.Error:
+        conn.execute(f"CREATE OR REPLACE TEMP TABLE {name} AS {sql}")
+        return name
+
+    table = f"{CACHE_ALIAS}.{name}"
+    conn.execute(f"CREATE TABLE IF NOT EXISTS {table} AS {sql}")
+    _update_cache_index(conn, key, name)
+    return table
+
+
+def _update_cache_index(conn: duckdb.DuckDBPyConnection, key: str, name: str) -> None:
+    """Record ``name`` as the live table for ``key`` and drop superseded ones.
+
+    Runs only after the new table was built, so a failed S3 read leaves the
+    previous entry in place.
+    """
+    has_index = conn.execute(
+        "SELECT COUNT(*) FROM duckdb_tables() "
+        "WHERE database_name = ? AND table_name = 'cache_index'",
+        [CACHE_ALIAS],
+    ).fetchone()[0]
+    if not has_index:
+        # Tables cached before the index existed cannot be attributed to a
+        # key; drop them once, keeping only the table just built.
+        legacy = conn.execute(
+            "SELECT table_name FROM duckdb_tables() "
+            "WHERE database_name = ? AND table_name LIKE 't\\_%' ESCAPE '\\' "
+            "AND table_name <> ?",
+            [CACHE_ALIAS, name],
+        ).fetchall()
+        for (old,) in legacy:
+            conn.execute(f"DROP TABLE IF EXISTS {CACHE_ALIAS}.{old}")
+        conn.execute(
+            f"CREATE TABLE {CACHE_INDEX} "
+            "(key VARCHAR PRIMARY KEY, release VARCHAR, name VARCHAR)"
+        )
+
+    stale = conn.execute(
+        f"SELECT key, name FROM {CACHE_INDEX} "
+        "WHERE (key = ? AND name <> ?) OR release <> ?",
+        [key, name, OVERTURE_RELEASE],
+    ).fetchall()
+    for old_key, old in stale:
+        conn.execute(f"DROP TABLE IF EXISTS {CACHE_ALIAS}.{old}")
+        if old_key != key:
+            conn.execute(f"DELETE FROM {CACHE_INDEX} WHERE key = ?", [old_key])
+    conn.execute(
+        f"INSERT OR REPLACE INTO {CACHE_INDEX} VALUES (?, ?, ?)",
+        [key, OVERTURE_RELEASE, name],
+    )
+
+
 # ---------------------------------------------------------------------------
 # Normalisation helpers (for composite scores)
 # ---------------------------------------------------------------------------
@@ -246,15 +442,20 @@ def normalize(value: float, min_val: float, max_val: float) -> float:
     return max(0.0, min(1.0, (value - min_val) / (max_val - min_val)))
 
 
-def shannon_entropy(proportions: list[float]) -> float:
-    """Compute Shannon entropy from a list of proportions."""
-    return -sum(p * math.log2(p) for p in proportions if p > 0)
+def shannon_entropy(proportions: ArrayLike) -> float:
+    """Compute Shannon entropy (bits) from a sequence of proportions.
+
+    Accepts a list, NumPy array or Polars Series; ``xlogy`` makes zero
+    proportions contribute 0 without a ``p > 0`` branch.
+    """
+    p = np.asarray(proportions, dtype=np.float64)
+    return float(-xlogy(p, p).sum() / math.log(2))
 
 
-def normalized_entropy(proportions: list[float]) -> float:
+def normalized_entropy(proportions: ArrayLike) -> float:
     """Compute Shannon entropy normalised to 0-1."""
-    n = len([p for p in proportions if p > 0])
+    p = np.asarray(proportions, dtype=np.float64)
+    n = np.count_nonzero(p > 0)
     if n <= 1:
         return 0.0
-    h = shannon_entropy(proportions)
-    return h / math.log2(n)
+    return float(-xlogy(p, p).sum() / math.log(n))
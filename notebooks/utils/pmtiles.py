@@ -0,0 +1,149 @@
+"""PMTiles v3 range-request helpers for the chrono.city EDA notebook."""
+
+from __future__ import annotations
+
+import functools
+import gzip
+import json
+import struct
+from collections import OrderedDict
+
+import requests
+
+
+# ---------------------------------------------------------------------------
+# PMTiles v3 header layout
+# ---------------------------------------------------------------------------
+HEADER_BYTES = 127
+COMPRESSION_GZIP = 2
+# The spec requires the header plus root directory to fit in the first 16 KiB
+ROOT_BYTES = 16_384
+
+# Compiled once: magic, version, then the 11 little-endian u64 offsets and
+# counts, then the clustered/compression/type/zoom bytes (trailing
+# bounds and center fields are not decoded).
+_HEADER = struct.Struct("<7sB11Q6B")
+
+# Shared by every cell so header, metadata and tile ranges reuse one
+# keep-alive connection per host.
+session = requests.Session()
+
+
+def fetch_range(url: str, offset: int, length: int) -> requests.Response:
+    """GET ``length`` bytes of ``url`` starting at ``offset``."""
+    resp = session.get(
+        url,
+        headers={
+            "Range": f"bytes={offset}-{offset + length - 1}",
+            # Tiles are already compressed; don't let the server re-encode them
+            "Accept-Encoding": "identity",
+        },
+        timeout=15,
+    )
+    resp.raise_for_status()
+    return resp
+
+
+def parse_header(data: bytes) -> dict:
+    """Decode the fields of a 127-byte PMTiles v3 header we care about."""
+    (
+        _magic, version,
+        _root_offset, _root_length, metadata_offset, metadata_length,
+        *_,
+        _clustered, internal_compression, _tile_compression, _tile_type,
+        min_zoom, max_zoom,
+    ) = _HEADER.unpack_from(data)
+    return {
+        "version": version,
+        "metadata_offset": metadata_offset,
+        "metadata_length": metadata_length,
+        "internal_compression": internal_compression,
+        "min_zoom": min_zoom,
+        "max_zoom": max_zoom,
+    }
+
+
+def read_metadata(url: str) -> dict:
+    """Return header fields plus the decoded JSON metadata of a PMTiles archive.
+
+    Fetches the 127-byte header, then only the metadata blob it points to.
+    The decoded metadata is cached per (url, ETag), so re-renders cost a
+    single header request.
+    """
+    resp = fetch_range(url, 0, HEADER_BYTES)
+    header = resp.content
+    magic = header[:7]
+    if magic != b"PMTiles":
+        return {"error": "Not a PMTiles v3 file", "magic": str(magic)}
+
+    hdr = parse_header(header)
+    info = {
+        "version": hdr["version"],
+        "min_zoom": hdr["min_zoom"],
+        "max_zoom": hdr["max_zoom"],
+        "url": url,
+        "header_bytes": len(header),
+    }
+    if hdr["metadata_length"] == 0:
+        info["metadata_note"] = "Archive has no metadata"
+        return info
+
+    try:
+        info["metadata"] = _fetch_metadata(
+            url,
+            resp.headers.get("ETag"),
+            hdr["metadata_offset"],
+            hdr["metadata_length"],
+            hdr["internal_compression"],
+        )
+    except Exception as e:
+        info["metadata_note"] = (
+            f"Could not read metadata at offset {hdr['metadata_offset']} "
+            f"(len {hdr['metadata_length']}): {e}"
+        )
+    return info
+
+
+@functools.lru_cache(maxsize=32)
+def _fetch_metadata(
+    url: str, etag: str | None, offset: int, length: int, compression: int
+) -> dict:
+    raw = fetch_range(url, offset, length).content
+    if compression == COMPRESSION_GZIP:
+        raw = gzip.decompress(raw)
+    return json.loads(raw)
+
+
+class RangeCache:
+    """Callable ``get_bytes(offset, length)`` source for ``pmtiles.reader.Reader``.
+
+    The Reader re-reads the header and walks directories on every tile
+    lookup.  The header and root directory are prefetched in one request,
+    and every fetched range is kept in a small LRU, so repeated reads that
+    fall inside a cached range never touch the network.
+    """
+
+    def __init__(self, url: str, max_ranges: int = 64):
+        self.url = url
+        self.max_ranges = max_ranges
+        # start offset → bytes fetched from there, least recently used first
+        self._ranges: OrderedDict[int, bytes] = OrderedDict()
+        self._ranges[0] = fetch_range(url, 0, ROOT_BYTES).content
+
+    def __call__(self, offset: int, length: int) -> bytes:
+        for start, buf in self._ranges.items():
+            if start <= offset and offset + length <= start + len(buf):
+                self._ranges.move_to_end(start)
+                return buf[offset - start : offset - start + length]
+
+        buf = fetch_range(self.url, offset, length).content
+        self._ranges[offset] = buf
+        if len(self._ranges) > self.max_ranges:
+            self._ranges.popitem(last=False)
+        return buf
+
+
+@functools.lru_cache(maxsize=8)
+def range_source(url: str) -> RangeCache:
+    """Return the shared :class:`RangeCache` for ``url``."""
+    return RangeCache(url)
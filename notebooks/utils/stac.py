@@ -0,0 +1,105 @@
+"""Parallel STAC catalog crawler for the chrono.city EDA notebook."""
+
+from __future__ import annotations
+
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+import orjson
+import requests
+from requests.adapters import HTTPAdapter
+
+
+MAX_WORKERS = 16
+
+# One pooled session shared by every worker thread so TLS connections to
+# the catalog host are reused across the crawl.
+session = requests.Session()
+session.mount("https://", HTTPAdapter(pool_connections=MAX_WORKERS, pool_maxsize=MAX_WORKERS))
+
+
+def _fetch_json(href: str) -> dict | Exception:
+    """GET a STAC document; return the exception instead of raising."""
+    try:
+        return orjson.loads(session.get(href, timeout=15).content)
+    except Exception as e:
+        return e
+
+
+def _child_hrefs(doc: dict, base: str) -> list[tuple[dict, str]]:
+    """Return (link, absolute href) for every ``rel=child`` link in ``doc``."""
+    out = []
+    for link in doc.get("links", []):
+        if link.get("rel") != "child":
+            continue
+        href = link.get("href", "")
+        if not href.startswith("http"):
+            href = base + "/" + href
+        out.append((link, href))
+    return out
+
+
+def _collection_row(theme: str, doc: dict) -> dict:
+    extent = doc.get("extent", {})
+    spatial = extent.get("spatial", {}).get("bbox", [])
+    temporal = extent.get("temporal", {}).get("interval", [])
+    return {
+        "theme": theme,
+        "collection": doc.get("title", doc.get("id", "?")),
+        "id": doc.get("id", "?"),
+        "description": doc.get("description", "")[:120],
+        "bbox": str(spatial[0]) if spatial else "—",
+        "temporal": str(temporal[0]) if temporal else "—",
+    }
+
+
+def _failed_row(theme: str, title: str, href: str) -> dict:
+    return {
+        "theme": theme,
+        "collection": title,
+        "id": "?",
+        "description": f"Failed to fetch: {href}",
+        "bbox": "—",
+        "temporal": "—",
+    }
+
+
+@functools.lru_cache(maxsize=4)
+def crawl_collections(catalog_url: str) -> tuple[dict, list[dict]]:
+    """Walk a STAC catalog two levels deep and summarise every collection.
+
+    Children are fetched in one parallel batch, then all grandchildren in a
+    second.  Returns the root catalog document and one row per collection,
+    in catalog order.  Results are cached per catalog URL.
+    """
+    catalog = orjson.loads(session.get(catalog_url, timeout=15).content)
+    children = _child_hrefs(catalog, catalog_url.rsplit("/", 1)[0])
+
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as pool:
+        child_docs = list(pool.map(_fetch_json, [href for _, href in children]))
+
+        grandchildren = []
+        for (_, href), doc in zip(children, child_docs):
+            if not isinstance(doc, Exception):
+                grandchildren.extend(_child_hrefs(doc, href.rsplit("/", 1)[0]))
+        grandchild_docs = dict(zip(
+            [href for _, href in grandchildren],
+            pool.map(_fetch_json, [href for _, href in grandchildren]),
+        ))
+
+    collections = []
+    for (link, href), doc in zip(children, child_docs):
+        if isinstance(doc, Exception):
+            collections.append(_failed_row("—", link.get("title", "?"), href))
+            continue
+        title = doc.get("title", doc.get("id", "unknown"))
+        sub_links = _child_hrefs(doc, href.rsplit("/", 1)[0])
+        if not sub_links:
+            collections.append(_collection_row("—", doc))
+        for sub_link, sub_href in sub_links:
+            sub = grandchild_docs[sub_href]
+            if isinstance(sub, Exception):
+                collections.append(_failed_row(title, sub_link.get("title", "?"), sub_href))
+            else:
+                collections.append(_collection_row(title, sub))
+    return catalog, collections